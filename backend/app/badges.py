@@ -0,0 +1,183 @@
+import io
+import multiprocessing
+import os
+import re
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import qrcode
+
+from . import qr
+
+# Worker processes for rendering; qrcode and PIL are CPU-bound and hold the GIL
+BADGE_WORKERS = int(os.getenv("BADGE_WORKERS", str(os.cpu_count() or 1)))
+
+# Badges handed to the pool at a time, which bounds what is held in memory
+BADGE_BATCH_SIZE = 48
+
+# Smaller requests render in-process; handing them to the pool costs more than it saves
+BADGE_POOL_MIN = int(os.getenv("BADGE_POOL_MIN", "24"))
+
+# US Letter page in points, with a 2 x 3 grid of badges
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+PAGE_MARGIN = 36
+BADGE_COLUMNS, BADGE_ROWS = 2, 3
+BADGE_QR_SIZE = 170
+BADGE_FONT_SIZE = 14
+BADGES_PER_PAGE = BADGE_COLUMNS * BADGE_ROWS
+
+def _render_vector(payload: str):
+    """Render a QR code as PDF path operators in module units; returns (size, operators)"""
+    code = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_H, border=4)
+    code.add_data(payload)
+    code.make(fit=True)
+    matrix = code.get_matrix()
+    size = len(matrix)
+
+    ops = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                ops.append(f"{start} {size - 1 - y} {x - start} 1 re")
+            else:
+                x += 1
+    return size, "\n".join(ops)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def _render_pool():
+    """The process pool shared by all requests, started on first use so its workers
+    import qrcode and PIL once rather than per request"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=BADGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+def shutdown_render_pool(pool=None):
+    """Stop the worker processes (of pool, if it is still the shared one); called on app shutdown"""
+    global _pool
+    with _pool_lock:
+        if pool is not None and pool is not _pool:
+            return
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+def _rendered(render, payloads):
+    """Yield render(payload) for each payload, in order, across the process pool for large requests"""
+    if BADGE_WORKERS <= 1 or len(payloads) < BADGE_POOL_MIN:
+        yield from map(render, payloads)
+        return
+    pool = _render_pool()
+    for start in range(0, len(payloads), BADGE_BATCH_SIZE):
+        batch = payloads[start:start + BADGE_BATCH_SIZE]
+        try:
+            yield from list(pool.map(render, batch, chunksize=max(1, len(batch) // BADGE_WORKERS)))
+        except BrokenProcessPool:
+            # A worker died; the next request starts a fresh pool and this one finishes here
+            shutdown_render_pool(pool)
+            for payload in payloads[start:]:
+                yield render(payload)
+            return
+
+def _pdf_text(text: str):
+    text = text.encode("latin-1", errors="replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+def _badge_page(badges):
+    """PDF content stream for one page of (name, (size, operators)) badges"""
+    cell_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) / BADGE_COLUMNS
+    cell_height = (PAGE_HEIGHT - 2 * PAGE_MARGIN) / BADGE_ROWS
+    parts = []
+    for index, (name, (size, ops)) in enumerate(badges):
+        column, row = index % BADGE_COLUMNS, index // BADGE_COLUMNS
+        x = PAGE_MARGIN + column * cell_width + (cell_width - BADGE_QR_SIZE) / 2
+        y = PAGE_HEIGHT - PAGE_MARGIN - (row + 1) * cell_height + 2 * BADGE_FONT_SIZE
+        scale = BADGE_QR_SIZE / size
+        parts.append(f"q {scale:.4f} 0 0 {scale:.4f} {x:.2f} {y:.2f} cm 0 g\n{ops}\nf Q")
+        parts.append(f"BT /F1 {BADGE_FONT_SIZE} Tf {x:.2f} {y - BADGE_FONT_SIZE:.2f} Td {_pdf_text(name)} Tj ET")
+    return "\n".join(parts).encode("latin-1")
+
+def stream_badge_pdf(users):
+    """Stream a printable PDF of QR badges for (id, name) users, one page at a time"""
+    offsets = {}
+    position = 0
+
+    def emit(number, body: bytes):
+        nonlocal position
+        offsets[number] = position
+        data = f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+        position += len(data)
+        return data
+
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    position = len(header)
+    yield header
+    # Object 2 (the page tree) is written last, once every page number is known
+    yield emit(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+    yield emit(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_numbers = []
+    next_number = 4
+    rendered = _rendered(_render_vector, [qr.user_qr_data(user) for user in users])
+    names = [user.name for user in users]
+    for start in range(0, len(users), BADGES_PER_PAGE):
+        page_names = names[start:start + BADGES_PER_PAGE]
+        content = _badge_page(list(zip(page_names, rendered)))
+        content_number, page_number = next_number, next_number + 1
+        next_number += 2
+        yield emit(content_number, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream")
+        yield emit(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_number} 0 R >>"
+        ).encode())
+        page_numbers.append(page_number)
+
+    kids = " ".join(f"{number} 0 R" for number in page_numbers)
+    yield emit(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_numbers)} >>".encode())
+
+    xref_position = position
+    xref = [f"xref\n0 {next_number}\n", "0000000000 65535 f \n"]
+    xref.extend(f"{offsets[number]:010d} 00000 n \n" for number in range(1, next_number))
+    xref.append(f"trailer\n<< /Size {next_number} /Root 1 0 R >>\nstartxref\n{xref_position}\n%%EOF\n")
+    yield "".join(xref).encode()
+
+class _ChunkBuffer(io.RawIOBase):
+    """Unseekable sink that lets zipfile write incrementally while the caller drains it"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def _badge_filename(user):
+    slug = re.sub(r"[^a-z0-9]+", "-", user.name.lower()).strip("-") or "student"
+    return f"{user.id}-{slug}.png"
+
+def stream_badge_zip(users):
+    """Stream a ZIP of per-student QR PNGs, one file at a time"""
+    buffer = _ChunkBuffer()
+    rendered = _rendered(qr.render_qr_png, [qr.user_qr_data(user) for user in users])
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for user, png in zip(users, rendered):
+            archive.writestr(_badge_filename(user), png)
+            yield buffer.drain()
+    yield buffer.drain()
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+# Entries kept per process, and seconds before an entry is reloaded. Writes in this
+# process invalidate immediately; the TTL bounds staleness across worker processes.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "300"))
+
+# Resolved users kept per process for scan and QR lookups
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "4096"))
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "600"))
+
+@dataclass
+class CachedResponse:
+    body: bytes
+    headers: dict = field(default_factory=dict)
+    etag: str = ""
+
+    def __post_init__(self):
+        if not self.etag:
+            self.etag = f'"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+
+class ResponseCache:
+    """Thread-safe LRU cache with a TTL, keyed by tuples whose first item is a namespace"""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE, ttl: float = RESPONSE_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def generation(self, namespace: str):
+        """Counter bumped by invalidate; pass it back to set to drop loads that raced a write"""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def set(self, key: tuple, value, generation: int = None):
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key[0], 0):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def discard(self, *keys: tuple):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def invalidate(self, namespace: str):
+        """Drop every entry in a namespace, e.g. "classes" after a class is written"""
+        with self._lock:
+            self._generations[namespace] = self._generations.get(namespace, 0) + 1
+            for key in [key for key in self._entries if key[0] == namespace]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+response_cache = ResponseCache()
+
+# Keyed by ("users", "id" | "email" | "name", value); see crud.find_user_by_qr_data
+identity_cache = ResponseCache(maxsize=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL)
@@ -1,23 +1,69 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
-from datetime import datetime, date, time
+from sqlalchemy import Integer, and_, bindparam, case, cast, delete, except_, exists, func, insert, literal, literal_column, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from dataclasses import dataclass
+from datetime import datetime, date, time, timedelta
+from . import cache
+from . import live
 from . import models
+from . import qr
 from . import schemas
+from . import search
+
+# Keep IN lists well under SQLite's bound-parameter limit
+IN_CHUNK_SIZE = 500
+
+def _chunks(items, size: int = IN_CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
 
 # User CRUD operations
 def get_user(db: Session, user_id: int):
     return db.query(models.User).filter(models.User.id == user_id).first()
 
-def get_users(db: Session):
-    return db.query(models.User).all()
+def get_users(db: Session, limit: int = None, after_id: int = None):
+    query = db.query(models.User).order_by(models.User.id)
+    if after_id is not None:
+        query = query.filter(models.User.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 def create_user(db: Session, name: str, email: str, role: str = "student"):
     db_user = models.User(name=name, email=email, role=role)
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    forget_users([db_user])
+    search.user_search_index.add(db_user.id, db_user.name, db_user.email, db_user.role)
     return db_user
 
+def get_user_ids(db: Session, user_ids: list):
+    """Return the subset of user_ids that exist"""
+    found = set()
+    for chunk in _chunks(user_ids):
+        found.update(row.id for row in db.query(models.User.id).filter(models.User.id.in_(chunk)))
+    return found
+
+def get_badge_users(db: Session, package_id: int = None, user_ids: list = None):
+    """(id, name) rows for badge printing: the given users, a package's students, or every student"""
+    query = db.query(models.User.id, models.User.name)
+    if user_ids:
+        users = []
+        for chunk in _chunks(set(user_ids)):
+            users.extend(query.filter(models.User.id.in_(chunk)))
+        return sorted(users, key=lambda user: (user.name.lower(), user.id))
+    query = query.filter(models.User.role == "student")
+    if package_id is not None:
+        # Packages have no enrollment table; a package's students are those who attended its classes
+        attended = db.query(models.Attendance.user_id).join(models.Class).filter(
+            models.Class.package_id == package_id
+        )
+        query = query.filter(models.User.id.in_(attended))
+    return query.order_by(func.lower(models.User.name), models.User.id).all()
+
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
@@ -39,14 +85,20 @@ def create_package(db: Session, name: str, description: str, price: float, start
     db.add(db_package)
     db.commit()
     db.refresh(db_package)
+    cache.response_cache.invalidate("packages")
     return db_package
 
 # Class CRUD operations
 def get_class(db: Session, class_id: int):
     return db.query(models.Class).filter(models.Class.id == class_id).first()
 
-def get_classes(db: Session):
-    return db.query(models.Class).all()
+def get_classes(db: Session, limit: int = None, after_id: int = None):
+    query = db.query(models.Class).order_by(models.Class.id)
+    if after_id is not None:
+        query = query.filter(models.Class.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 def create_class(db: Session, package_id: int, date: date, start_time: time, end_time: time, location: str):
     db_class = models.Class(
@@ -59,6 +111,7 @@ def create_class(db: Session, package_id: int, date: date, start_time: time, end
     db.add(db_class)
     db.commit()
     db.refresh(db_class)
+    cache.response_cache.invalidate("classes")
     return db_class
 
 def get_classes_by_date_package(db: Session, date: date, package_id: int):
@@ -69,12 +122,21 @@ def get_classes_by_date_package(db: Session, date: date, package_id: int):
         )
     ).all()
 
-def get_classes_by_package(db: Session, package_id: int, start_date: date = None, end_date: date = None):
+def get_classes_by_package(db: Session, package_id: int, start_date: date = None, end_date: date = None,
+                           cancelled: bool = None, limit: int = None, after: tuple = None):
+    """Classes of a package in (date, id) order; after is the (date, id) of the last row already seen"""
     query = db.query(models.Class).filter(models.Class.package_id == package_id)
     if start_date:
         query = query.filter(models.Class.date >= start_date)
     if end_date:
         query = query.filter(models.Class.date <= end_date)
+    if cancelled is not None:
+        query = query.filter(models.Class.cancelled == cancelled)
+    if after is not None:
+        query = query.filter(tuple_(models.Class.date, models.Class.id) > after)
+    query = query.order_by(models.Class.date, models.Class.id)
+    if limit is not None:
+        query = query.limit(limit)
     return query.all()
 
 def cancel_class(db: Session, class_id: int):
@@ -83,8 +145,344 @@ def cancel_class(db: Session, class_id: int):
         db_class.cancelled = True
         db.commit()
         db.refresh(db_class)
+        cache.response_cache.invalidate("classes")
     return db_class
 
+# Schedule operations
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+def schedule_dates(start_date: date, end_date: date, weekdays: list, skip_dates=()):
+    """Dates from start_date to end_date inclusive that fall on one of weekdays (names)"""
+    days = {WEEKDAYS.index(day) for day in weekdays}
+    skip = set(skip_dates)
+    current = start_date
+    while current <= end_date:
+        if current.weekday() in days and current not in skip:
+            yield current
+        current += timedelta(days=1)
+
+def generate_schedule(db: Session, package_id: int, slots: list, start_date: date, end_date: date,
+                      skip_dates=(), preview: bool = False):
+    """Create a class for every slot on every matching date with multi-row INSERTs.
+
+    slots are dicts of weekdays, start_time, end_time and location. Dates that already
+    have a class of the package at the same start time and location are skipped, so
+    running the generator again only fills gaps. Returns (classes, skipped); with
+    preview nothing is written and the classes have no id.
+    """
+    existing = set(db.execute(
+        select(models.Class.date, models.Class.start_time, models.Class.location)
+        .where(models.Class.package_id == package_id, models.Class.date.between(start_date, end_date))
+    ).all())
+    rows, skipped = [], 0
+    for slot in slots:
+        for class_date in schedule_dates(start_date, end_date, slot["weekdays"], skip_dates):
+            if (class_date, slot["start_time"], slot["location"]) in existing:
+                skipped += 1
+                continue
+            existing.add((class_date, slot["start_time"], slot["location"]))
+            rows.append({
+                "package_id": package_id, "date": class_date, "start_time": slot["start_time"],
+                "end_time": slot["end_time"], "location": slot["location"], "cancelled": False
+            })
+    rows.sort(key=lambda row: (row["date"], row["start_time"], row["location"]))
+    if preview or not rows:
+        return [models.Class(**row) for row in rows], skipped
+
+    table = models.Class.__table__
+    created = []
+    # A season is usually a single statement; chunk by bound parameters, not rows
+    for chunk in _chunks(rows, IN_CHUNK_SIZE // len(rows[0])):
+        created += db.execute(insert(table).values(chunk).returning(*table.c)).all()
+    db.commit()
+    cache.response_cache.invalidate("classes")
+    return [models.Class(**row._mapping) for row in created], skipped
+
+def class_selection(db: Session, package_id: int = None, start_date: date = None, end_date: date = None,
+                    location: str = None, weekdays: list = None):
+    """WHERE criteria for a bulk schedule operation"""
+    criteria = []
+    if package_id is not None:
+        criteria.append(models.Class.package_id == package_id)
+    if start_date:
+        criteria.append(models.Class.date >= start_date)
+    if end_date:
+        criteria.append(models.Class.date <= end_date)
+    if location is not None:
+        criteria.append(models.Class.location == location)
+    if weekdays:
+        # Both strftime('%w') and extract(dow) count from Sunday = 0
+        numbers = [(WEEKDAYS.index(day) + 1) % 7 for day in weekdays]
+        if db.get_bind().dialect.name == "postgresql":
+            criteria.append(func.extract("dow", models.Class.date).in_(numbers))
+        else:
+            criteria.append(cast(func.strftime("%w", models.Class.date), Integer).in_(numbers))
+    return criteria
+
+def shifted_date(db: Session, days: int):
+    """SQL expression for the class date moved by days"""
+    if db.get_bind().dialect.name == "postgresql":
+        return models.Class.date + days
+    return func.date(models.Class.date, f"{days:+d} days")
+
+def update_classes(db: Session, criteria: list, values: dict, preview: bool = False):
+    """Apply values to every class matching criteria in a single UPDATE ... RETURNING.
+
+    With preview the matching classes are returned as they are, and nothing is written.
+    """
+    table = models.Class.__table__
+    if preview:
+        return db.execute(select(table).where(*criteria).order_by(table.c.date, table.c.start_time, table.c.id)).all()
+    rows = db.execute(update(table).where(*criteria).values(**values).returning(*table.c)).all()
+    db.commit()
+    if rows:
+        cache.response_cache.invalidate("classes")
+    return sorted(rows, key=lambda row: (row.date, row.start_time, row.id))
+
+def shift_classes(db: Session, criteria: list, days: int, preview: bool = False):
+    return update_classes(db, criteria, {"date": shifted_date(db, days)}, preview)
+
+def reschedule_classes(db: Session, criteria: list, start_time: time = None, end_time: time = None,
+                       location: str = None, preview: bool = False):
+    values = {"start_time": start_time, "end_time": end_time, "location": location}
+    return update_classes(db, criteria, {name: value for name, value in values.items() if value is not None}, preview)
+
+def cancel_classes(db: Session, criteria: list, cancelled: bool = True, preview: bool = False):
+    return update_classes(db, criteria + [models.Class.cancelled.is_not(cancelled)], {"cancelled": cancelled}, preview)
+
+# Attendance aggregates
+ATTENDANCE_STATUSES = ("present", "late", "missing")
+
+def _count_status(*statuses):
+    return func.count(case((models.Attendance.status.in_(statuses), 1)))
+
+def attendance_deltas(changes):
+    """Net count changes per class and per (class, user) for attendance writes.
+
+    changes are (class_id, user_id, old status, new status) tuples, with None for a
+    row that didn't exist before or was deleted; unchanged statuses cancel out.
+    """
+    by_class, by_user = {}, {}
+    for class_id, user_id, old, new in changes:
+        if old == new:
+            continue
+        for status, sign in ((old, -1), (new, 1)):
+            if status not in ATTENDANCE_STATUSES:
+                continue
+            class_delta = by_class.setdefault(class_id, dict.fromkeys(ATTENDANCE_STATUSES, 0))
+            class_delta[status] += sign
+            user_delta = by_user.setdefault((class_id, user_id), {"attended": 0, "late": 0, "missing": 0})
+            if status in ("present", "late"):
+                user_delta["attended"] += sign
+            if status != "present":
+                user_delta[status] += sign
+    return by_class, by_user
+
+def attendance_delta_statements(dialect: str, changes, packages: dict = None):
+    """Statements that add the count changes of attendance writes to the aggregate rows.
+
+    Each touched key gets a +n/-n upsert, never a recount. packages maps class_id to
+    package_id when the caller already knows it; otherwise the per-student rows look
+    up each class's package in a subquery, one statement per class. Rows a delete
+    brings to zero are removed, as a rebuild wouldn't have them.
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    class_stats, user_stats = models.ClassAttendanceStats.__table__, models.UserPackageAttendance.__table__
+    changes = list(changes)
+    by_class, by_user = attendance_deltas(changes)
+    statements = []
+
+    class_rows = [{"class_id": class_id, **delta} for class_id, delta in by_class.items() if any(delta.values())]
+    for chunk in _chunks(class_rows, IN_CHUNK_SIZE // len(ATTENDANCE_STATUSES)):
+        stmt = insert(class_stats).values(chunk)
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[class_stats.c.class_id],
+            set_={name: class_stats.c[name] + stmt.excluded[name] for name in ATTENDANCE_STATUSES}
+        ))
+
+    # One multi-row upsert per package group; a statement may not upsert a key twice
+    user_rows = {}
+    for (class_id, user_id), delta in by_user.items():
+        if not any(delta.values()):
+            continue
+        if packages is not None:
+            group, package_id = None, packages[class_id]
+        else:
+            group = class_id
+            package_id = select(models.Class.package_id).where(models.Class.id == class_id).scalar_subquery()
+        row = user_rows.setdefault(group, {}).setdefault((user_id, package_id if group is None else None), {
+            "user_id": user_id, "package_id": package_id, "attended": 0, "late": 0, "missing": 0
+        })
+        for name, value in delta.items():
+            row[name] += value
+    for rows in user_rows.values():
+        rows = list(rows.values())
+        for chunk in _chunks(rows, IN_CHUNK_SIZE // len(rows[0])):
+            stmt = insert(user_stats).values(chunk)
+            statements.append(stmt.on_conflict_do_update(
+                index_elements=[user_stats.c.user_id, user_stats.c.package_id],
+                set_={name: user_stats.c[name] + stmt.excluded[name] for name in ("attended", "late", "missing")}
+            ))
+
+    if any(new is None for _, _, _, new in changes):
+        for chunk in _chunks({class_id for class_id, _, _, _ in changes}):
+            statements.append(delete(class_stats).where(
+                class_stats.c.class_id.in_(chunk),
+                *(class_stats.c[name] == 0 for name in ATTENDANCE_STATUSES)
+            ))
+        for chunk in _chunks({user_id for _, user_id, _, _ in changes}):
+            # attended covers late, so these two are zero only when every count is
+            statements.append(delete(user_stats).where(
+                user_stats.c.user_id.in_(chunk), user_stats.c.attended == 0, user_stats.c.missing == 0
+            ))
+    return statements
+
+def class_packages(db: Session, class_ids):
+    """{class_id: package_id} for the classes that exist, with chunked IN queries"""
+    packages = {}
+    for chunk in _chunks(set(class_ids)):
+        packages.update(db.execute(select(models.Class.id, models.Class.package_id).where(models.Class.id.in_(chunk))).all())
+    return packages
+
+def apply_attendance_deltas(db: Session, changes, packages: dict = None):
+    """Bring the aggregates in line with attendance writes, inside their transaction"""
+    for stmt in attendance_delta_statements(db.get_bind().dialect.name, changes, packages):
+        db.execute(stmt)
+
+def upserted_changes(rows):
+    """(class_id, user_id, old, new) for attendance rows returned by attendance_upsert"""
+    return [(row.class_id, row.user_id, row.previous_status, row.status) for row in rows]
+
+def attendance_stats_statements(dialect: str, class_ids, package_ids=None):
+    """Statements that recompute the aggregate rows of whole classes and packages.
+
+    Class rows are recomputed for class_ids, and every student's row in package_ids
+    (by default the packages of class_ids). Used after bulk loads that bypass the
+    write paths, such as bundle imports; writes apply deltas instead.
+    """
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    attendance, classes = models.Attendance.__table__, models.Class.__table__
+    class_stats, user_stats = models.ClassAttendanceStats.__table__, models.UserPackageAttendance.__table__
+    statements = []
+
+    for chunk in _chunks(set(class_ids)):
+        counts = (
+            select(attendance.c.class_id, _count_status("present"), _count_status("late"), _count_status("missing"))
+            .where(attendance.c.class_id.in_(chunk))
+            .group_by(attendance.c.class_id)
+        )
+        stmt = insert(class_stats).from_select(["class_id", "present", "late", "missing"], counts)
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[class_stats.c.class_id],
+            set_={name: stmt.excluded[name] for name in ATTENDANCE_STATUSES}
+        ))
+
+    if package_ids is None:
+        package_groups = [select(classes.c.package_id).where(classes.c.id.in_(chunk)) for chunk in _chunks(set(class_ids))]
+    else:
+        package_groups = list(_chunks(set(package_ids)))
+    for packages in package_groups:
+        counts = (
+            select(attendance.c.user_id, classes.c.package_id, _count_status("present", "late"),
+                   _count_status("late"), _count_status("missing"))
+            .select_from(attendance.join(classes, classes.c.id == attendance.c.class_id))
+            .where(classes.c.package_id.in_(packages))
+            .group_by(attendance.c.user_id, classes.c.package_id)
+        )
+        stmt = insert(user_stats).from_select(["user_id", "package_id", "attended", "late", "missing"], counts)
+        statements.append(stmt.on_conflict_do_update(
+            index_elements=[user_stats.c.user_id, user_stats.c.package_id],
+            set_={name: stmt.excluded[name] for name in ("attended", "late", "missing")}
+        ))
+    return statements
+
+def rebuild_attendance_stats(db: Session):
+    """Recompute both aggregate tables from attendance; returns their new row counts"""
+    attendance, classes = models.Attendance.__table__, models.Class.__table__
+    class_stats, user_stats = models.ClassAttendanceStats.__table__, models.UserPackageAttendance.__table__
+    db.execute(delete(class_stats))
+    db.execute(delete(user_stats))
+    db.execute(insert(class_stats).from_select(["class_id", "present", "late", "missing"], attendance_stats_select("classes")))
+    db.execute(insert(user_stats).from_select(["user_id", "package_id", "attended", "late", "missing"], attendance_stats_select("users")))
+    db.commit()
+    return {
+        "class_attendance_stats": db.scalar(select(func.count()).select_from(class_stats)),
+        "user_package_attendance": db.scalar(select(func.count()).select_from(user_stats)),
+    }
+
+def attendance_stats_select(level: str):
+    """Aggregate rows computed from attendance, per class ("classes") or per user and package ("users")"""
+    attendance, classes = models.Attendance.__table__, models.Class.__table__
+    if level == "classes":
+        return (
+            select(attendance.c.class_id, _count_status("present"), _count_status("late"), _count_status("missing"))
+            .group_by(attendance.c.class_id)
+        )
+    return (
+        select(attendance.c.user_id, classes.c.package_id, _count_status("present", "late"),
+               _count_status("late"), _count_status("missing"))
+        .select_from(attendance.join(classes, classes.c.id == attendance.c.class_id))
+        .group_by(attendance.c.user_id, classes.c.package_id)
+    )
+
+def check_attendance_stats(db: Session):
+    """Aggregate rows that differ from a fresh computation, per table (stale, missing or extra)"""
+    drift = {}
+    for level, model, columns in (
+        ("classes", models.ClassAttendanceStats, ["class_id", "present", "late", "missing"]),
+        ("users", models.UserPackageAttendance, ["user_id", "package_id", "attended", "late", "missing"]),
+    ):
+        stored = select(*(model.__table__.c[name] for name in columns))
+        computed = attendance_stats_select(level)
+        drift[model.__tablename__] = sum(
+            db.scalar(select(func.count()).select_from(except_(first, second).subquery()))
+            for first, second in ((computed, stored), (stored, computed))
+        )
+    return drift
+
+# Attendance reports; each row reads one aggregate row instead of the attendance history
+def get_class_attendance_report(db: Session, start_date: date, end_date: date, package_id: int = None):
+    stats = models.ClassAttendanceStats
+    present, late = func.coalesce(stats.present, 0), func.coalesce(stats.late, 0)
+    query = (
+        select(
+            models.Class.id, models.Class.package_id, models.Package.name.label("package_name"), models.Class.date,
+            models.Class.start_time, models.Class.end_time, models.Class.location, models.Class.cancelled,
+            present.label("present"), late.label("late"), func.coalesce(stats.missing, 0).label("missing"),
+            (present + late).label("headcount")
+        )
+        .join(models.Package, models.Package.id == models.Class.package_id)
+        .outerjoin(stats, stats.class_id == models.Class.id)
+        .where(models.Class.date.between(start_date, end_date))
+        .order_by(models.Class.date, models.Class.start_time, models.Class.id)
+    )
+    if package_id is not None:
+        query = query.where(models.Class.package_id == package_id)
+    return db.execute(query).all()
+
+def get_package_attendance_report(db: Session, package_id: int, as_of: date):
+    """(classes held up to as_of, per-student counts ordered by most attended)"""
+    classes_held = db.scalar(select(func.count()).where(
+        models.Class.package_id == package_id, models.Class.date <= as_of, models.Class.cancelled.is_not(True)
+    ))
+    stats = models.UserPackageAttendance
+    students = db.execute(
+        select(stats.user_id, models.User.name, models.User.email, stats.attended, stats.late, stats.missing)
+        .join(models.User, models.User.id == stats.user_id)
+        .where(stats.package_id == package_id)
+        .order_by(stats.attended.desc(), models.User.name, stats.user_id)
+    ).all()
+    return classes_held, students
+
+def get_user_attendance_report(db: Session, user_id: int):
+    stats = models.UserPackageAttendance
+    return db.execute(
+        select(stats.package_id, models.Package.name.label("package_name"), stats.attended, stats.late, stats.missing)
+        .join(models.Package, models.Package.id == stats.package_id)
+        .where(stats.user_id == user_id)
+        .order_by(models.Package.start_date.desc(), stats.package_id)
+    ).all()
+
 # Attendance CRUD operations
 def get_attendance(db: Session, class_id: int):
     return db.query(models.Attendance).filter(models.Attendance.class_id == class_id).all()
@@ -100,109 +498,416 @@ def get_user_attendance(db: Session, user_id: int, start_date: date = None, end_
         query = query.filter(models.Class.date <= end_date)
     return query.all()
 
+def attendance_upsert(db: Session, rows: list, keep_checked_in: bool = False):
+    """Build a single INSERT ... ON CONFLICT (class_id, user_id) DO UPDATE ... RETURNING statement.
+
+    With keep_checked_in, rows already marked present or late are left untouched and
+    are not returned. Returned rows carry previous_status (None when inserted), from
+    which the aggregates are updated.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    table = models.Attendance.__table__
+    stmt = insert(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.class_id, table.c.user_id],
+        set_={"status": stmt.excluded.status, "checked_in_at": stmt.excluded.checked_in_at, "previous_status": table.c.status},
+        where=table.c.status.notin_(["present", "late"]) if keep_checked_in else None,
+    )
+    return stmt.returning(*table.c)
+
 def mark_attendance(db: Session, class_id: int, user_id: int, status: str = "present"):
-    # Check if attendance already exists
-    existing = db.query(models.Attendance).filter(
+    row = db.execute(attendance_upsert(db, [{
+        "class_id": class_id,
+        "user_id": user_id,
+        "status": status,
+        "checked_in_at": datetime.now()
+    }])).one()
+    apply_attendance_deltas(db, upserted_changes([row]))
+    db.commit()
+    live.publish_marked([row])
+    # Built from the RETURNING row, so no refresh round trip is needed
+    return models.Attendance(**row._mapping)
+
+def check_in_upsert(db: Session, class_id: int, user_id: int, status: str):
+    """attendance_upsert(keep_checked_in=True) for one user, inserted only while the user exists.
+
+    The row is selected from users, so a deleted user writes nothing even where the
+    foreign key is not enforced (SQLite), and RETURNING carries the user's name; a
+    signed badge is checked in without reading the user first.
+    """
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    table = models.Attendance.__table__
+    source = select(literal(class_id), models.User.id, literal(status), literal(datetime.now())).where(models.User.id == user_id)
+    stmt = insert(table).from_select(["class_id", "user_id", "status", "checked_in_at"], source)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.class_id, table.c.user_id],
+        set_={"status": stmt.excluded.status, "checked_in_at": stmt.excluded.checked_in_at, "previous_status": table.c.status},
+        where=table.c.status.notin_(["present", "late"]),
+    )
+    users = models.User.__table__.alias("badge_user")
+    user_name = select(users.c.name).where(users.c.id == literal_column("attendance.user_id")).scalar_subquery()
+    return stmt.returning(*table.c, user_name.label("user_name"))
+
+def check_in_attendance(db: Session, class_id: int, user_id: int, status: str = "present"):
+    """Mark attendance unless the user is already present or late, or no longer exists.
+
+    Returns the written row with user_name, or None; check_in_state tells the two apart.
+    """
+    row = db.execute(check_in_upsert(db, class_id, user_id, status)).first()
+    if row:
+        apply_attendance_deltas(db, upserted_changes([row]))
+    db.commit()
+    if not row:
+        return None
+    live.publish_marked([row])
+    return row
+
+def check_in_state_select(class_id: int, user_id: int):
+    """The user's name and current status for class_id; no row if the user does not exist"""
+    return select(models.User.name.label("user_name"), models.Attendance.status).select_from(models.User).outerjoin(
+        models.Attendance,
+        and_(models.Attendance.class_id == class_id, models.Attendance.user_id == models.User.id)
+    ).where(models.User.id == user_id)
+
+def check_in_state(db: Session, class_id: int, user_id: int):
+    return db.execute(check_in_state_select(class_id, user_id)).first()
+
+def mark_attendance_bulk(db: Session, class_id: int, entries: list):
+    """Mark many users for one class with a single multi-row upsert in one transaction"""
+    now = datetime.now()
+    # One row per user: a statement may not upsert the same (class_id, user_id) twice
+    statuses = {entry["user_id"]: entry["status"] for entry in entries}
+    rows = []
+    if statuses:
+        rows = db.execute(attendance_upsert(db, [
+            {"class_id": class_id, "user_id": user_id, "status": status, "checked_in_at": now}
+            for user_id, status in statuses.items()
+        ])).all()
+        apply_attendance_deltas(db, upserted_changes(rows))
+    counts = get_attendance_counts(db, class_id)
+    db.commit()
+    live.publish_marked(rows)
+    return [models.Attendance(**row._mapping) for row in rows], counts
+
+def apply_queued_scans(db: Session, scans: list):
+    """Apply a batch of offline scans in one transaction, skipping idempotency keys already seen.
+
+    Each scan is a dict with idempotency_key, qr_data, class_id, status and checked_in_at
+    (the device timestamp). Returns one result dict per distinct key; scans of invalid
+    badges or of classes that don't exist are "rejected" and leave no receipt.
+    """
+    scans = list({scan["idempotency_key"]: scan for scan in scans}.values())
+    receipts = models.ScanReceipt.__table__
+    
+    # Replayed keys report the user of their receipt, named so the station can show who it was
+    seen = {}
+    for chunk in _chunks([scan["idempotency_key"] for scan in scans]):
+        seen.update((row.idempotency_key, row) for row in db.execute(
+            select(receipts, models.User.name.label("user_name"))
+            .outerjoin(models.User, models.User.id == receipts.c.user_id)
+            .where(receipts.c.idempotency_key.in_(chunk))
+        ))
+    fresh = [scan for scan in scans if scan["idempotency_key"] not in seen]
+    packages = class_packages(db, {scan["class_id"] for scan in fresh})
+    class_ids = set(packages)
+    fresh = [scan for scan in fresh if scan["class_id"] in class_ids]
+    users, created = resolve_users_for_qr_data(db, [scan["qr_data"] for scan in fresh])
+    
+    # The earliest scan of a user for a class is the one that counts
+    first_scans = {}
+    for scan in sorted(fresh, key=lambda scan: scan["checked_in_at"]):
+        if scan["qr_data"] not in users:
+            continue
+        first_scans.setdefault((scan["class_id"], users[scan["qr_data"]].id), scan)
+    
+    rows = []
+    applied = set()
+    if first_scans:
+        rows = db.execute(attendance_upsert(db, [
+            {"class_id": class_id, "user_id": user_id, "status": scan["status"], "checked_in_at": scan["checked_in_at"]}
+            for (class_id, user_id), scan in first_scans.items()
+        ], keep_checked_in=True)).all()
+        applied = {first_scans[(row.class_id, row.user_id)]["idempotency_key"] for row in rows}
+        if rows:
+            apply_attendance_deltas(db, upserted_changes(rows), packages)
+    
+    results = []
+    new_receipts = []
+    for scan in scans:
+        key = scan["idempotency_key"]
+        if key in seen:
+            results.append({"idempotency_key": key, "result": "duplicate", "user_id": seen[key].user_id,
+                            "class_id": seen[key].class_id, "user_name": seen[key].user_name})
+            continue
+        user = users.get(scan["qr_data"]) if scan["class_id"] in class_ids else None
+        if user is None:
+            results.append({"idempotency_key": key, "result": "rejected", "user_id": None, "class_id": scan["class_id"]})
+            continue
+        result = "applied" if key in applied else "already_present"
+        new_receipts.append({"idempotency_key": key, "class_id": scan["class_id"], "user_id": user.id, "result": result})
+        results.append({"idempotency_key": key, "result": result, "user_id": user.id, "class_id": scan["class_id"], "user_name": user.name})
+    
+    if new_receipts:
+        insert_receipts = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        db.execute(insert_receipts(receipts).values(new_receipts).on_conflict_do_nothing())
+    db.commit()
+    forget_users(created)
+    for row in created:
+        # Users created from scans are always students
+        search.user_search_index.add(row.id, row.name, row.email, "student")
+    live.publish_marked(rows)
+    return results
+
+def get_attendance_counts(db: Session, class_id: int):
+    """Count students by attendance status for a class; unmarked students count as missing"""
+    status = func.coalesce(models.Attendance.status, "missing")
+    rows = db.execute(student_attendance_select(class_id, status, func.count(models.User.id)).group_by(status)).all()
+    counts = {"present": 0, "late": 0, "missing": 0}
+    counts.update(rows)
+    return counts
+
+def get_attendance_record(db: Session, class_id: int, user_id: int):
+    return db.query(models.Attendance).filter(
         and_(
             models.Attendance.class_id == class_id,
             models.Attendance.user_id == user_id
         )
     ).first()
-    
-    if existing:
-        existing.status = status
-        existing.checked_in_at = datetime.now()
-        db.commit()
-        db.refresh(existing)
-        return existing
-    else:
-        attendance = models.Attendance(
-            class_id=class_id,
-            user_id=user_id,
-            status=status
-        )
-        db.add(attendance)
-        db.commit()
-        db.refresh(attendance)
-        return attendance
 
 def create_attendance(db: Session, attendance: schemas.AttendanceCreate):
     db_attendance = models.Attendance(**attendance.dict())
     db.add(db_attendance)
+    db.flush()
+    apply_attendance_deltas(db, [(attendance.class_id, attendance.user_id, None, db_attendance.status)])
     db.commit()
     db.refresh(db_attendance)
     return db_attendance
 
 def update_attendance_status(db: Session, class_id: int, user_id: int, status: str):
-    attendance = db.query(models.Attendance).filter(
-        and_(
-            models.Attendance.class_id == class_id,
-            models.Attendance.user_id == user_id
-        )
+    table = models.Attendance.__table__
+    row = db.execute(
+        update(table)
+        .where(and_(table.c.class_id == class_id, table.c.user_id == user_id))
+        .values(status=status, checked_in_at=datetime.now(), previous_status=table.c.status)
+        .returning(*table.c)
     ).first()
-    
-    if attendance:
-        attendance.status = status
-        attendance.checked_in_at = datetime.now()
-        db.commit()
-        db.refresh(attendance)
-        return attendance
-    return None
+    if row:
+        apply_attendance_deltas(db, upserted_changes([row]))
+    db.commit()
+    if not row:
+        return None
+    live.publish_marked([row])
+    return models.Attendance(**row._mapping)
 
 def delete_attendance_record(db: Session, class_id: int, user_id: int):
-    attendance = db.query(models.Attendance).filter(
+    table = models.Attendance.__table__
+    status = db.execute(delete(table).where(
         and_(
-            models.Attendance.class_id == class_id,
-            models.Attendance.user_id == user_id
+            table.c.class_id == class_id,
+            table.c.user_id == user_id
         )
-    ).first()
-    
-    if attendance:
-        db.delete(attendance)
-        db.commit()
+    ).returning(table.c.status)).first()
+    if status:
+        apply_attendance_deltas(db, [(class_id, user_id, status.status, None)])
+    db.commit()
+    if status:
+        live.publish_deleted(class_id, [user_id])
         return True
     return False
 
+# Maintenance deletes
+# Rows removed per statement by purges; each chunk commits so other writers get the lock in between
+PURGE_CHUNK_SIZE = 5000
+
+def clear_class_attendance(db: Session, class_id: int):
+    """Delete every attendance record of a class with one DELETE; returns the count"""
+    table = models.Attendance.__table__
+    deleted = db.execute(delete(table).where(table.c.class_id == class_id).returning(table.c.user_id, table.c.status)).all()
+    if deleted:
+        apply_attendance_deltas(db, [(class_id, row.user_id, row.status, None) for row in deleted])
+    db.commit()
+    if deleted:
+        live.publish_deleted(class_id)
+    return len(deleted)
+
+def clear_package_attendance(db: Session, package_id: int, start_date: date = None, end_date: date = None):
+    """Delete the attendance of a package's classes in a date range with one DELETE.
+
+    Returns {class_id: records deleted} for the classes that had any.
+    """
+    table = models.Attendance.__table__
+    class_ids = select(models.Class.id).where(*class_selection(db, package_id=package_id, start_date=start_date, end_date=end_date))
+    deleted = db.execute(
+        delete(table).where(table.c.class_id.in_(class_ids)).returning(table.c.class_id, table.c.user_id, table.c.status)
+    ).all()
+    if deleted:
+        apply_attendance_deltas(
+            db, [(row.class_id, row.user_id, row.status, None) for row in deleted],
+            packages=dict.fromkeys({row.class_id for row in deleted}, package_id)
+        )
+    db.commit()
+    counts = {}
+    for class_id, _, _ in deleted:
+        counts[class_id] = counts.get(class_id, 0) + 1
+    for class_id in counts:
+        live.publish_deleted(class_id)
+    return counts
+
+def count_attendance_before(db: Session, before: date):
+    """(attendance records, scan receipts) of classes dated before before"""
+    old_classes = select(models.Class.id).where(models.Class.date < before)
+    return (
+        db.scalar(select(func.count()).where(models.Attendance.class_id.in_(old_classes))),
+        db.scalar(select(func.count()).where(models.ScanReceipt.class_id.in_(old_classes))),
+    )
+
+def _purge_chunked(db: Session, table, key, criteria, chunk_size: int, update_stats: bool = False):
+    """Delete rows matching criteria chunk_size at a time; returns (class_ids of deleted rows, chunks)"""
+    class_ids, chunks = [], 0
+    returning = [table.c.class_id, table.c.user_id] + ([table.c.status] if update_stats else [])
+    while True:
+        chunk = select(key).where(*criteria).limit(chunk_size)
+        deleted = db.execute(delete(table).where(key.in_(chunk)).returning(*returning)).all()
+        if deleted and update_stats:
+            apply_attendance_deltas(
+                db, [(row.class_id, row.user_id, row.status, None) for row in deleted],
+                packages=class_packages(db, {row.class_id for row in deleted})
+            )
+        db.commit()
+        chunks += 1
+        class_ids.extend(row.class_id for row in deleted)
+        if len(deleted) < chunk_size:
+            return class_ids, chunks
+
+def purge_attendance_before(db: Session, before: date, chunk_size: int = PURGE_CHUNK_SIZE):
+    """Delete attendance and scan receipts of every class dated before before.
+
+    Runs in DELETEs of at most chunk_size rows, each in its own transaction, so a large
+    purge never holds the SQLite write lock for long. Returns the counts removed.
+    """
+    old_classes = select(models.Class.id).where(models.Class.date < before)
+    attendance = models.Attendance.__table__
+    receipts = models.ScanReceipt.__table__
+    attendance_classes, attendance_chunks = _purge_chunked(
+        db, attendance, attendance.c.id, [attendance.c.class_id.in_(old_classes)], chunk_size, update_stats=True
+    )
+    receipt_classes, receipt_chunks = _purge_chunked(
+        db, receipts, receipts.c.idempotency_key, [receipts.c.class_id.in_(old_classes)], chunk_size
+    )
+    cleared = set(attendance_classes)
+    for class_id in cleared:
+        live.publish_deleted(class_id)
+    return {
+        "attendance": len(attendance_classes),
+        "scan_receipts": len(receipt_classes),
+        "classes": len(cleared),
+        "chunks": attendance_chunks + receipt_chunks,
+    }
+
 # Utility functions
+@dataclass(frozen=True)
+class UserIdentity:
+    """Snapshot of a user held in the identity cache, safe to share across sessions"""
+    id: int
+    name: str
+    email: str
+    role: str
+
+def user_identity_select(*criteria):
+    return select(models.User.id, models.User.name, models.User.email, models.User.role).where(*criteria)
+
+def user_lookup_statement(qr_data: str):
+    """One indexed query matching an email or a normalized name; email matches win, then the oldest user"""
+    email_match = models.User.email == qr_data
+    return (
+        user_identity_select(or_(email_match, models.User.normalized_name == models.normalize_name(qr_data)))
+        .add_columns(email_match.label("email_match"))
+        .order_by(email_match.desc(), models.User.id)
+        .limit(1)
+    )
+
+def remember_user(row, normalized_name: str = None):
+    """Cache a resolved user by id and email, and by name when it is that name's match"""
+    identity = UserIdentity(row.id, row.name, row.email, row.role)
+    cache.identity_cache.set(("users", "id", identity.id), identity)
+    cache.identity_cache.set(("users", "email", identity.email), identity)
+    if normalized_name is not None:
+        cache.identity_cache.set(("users", "name", normalized_name), identity)
+    return identity
+
+def cached_user_lookup(qr_data: str):
+    return (
+        cache.identity_cache.get(("users", "email", qr_data))
+        or cache.identity_cache.get(("users", "name", models.normalize_name(qr_data)))
+    )
+
+def remember_user_lookup(qr_data: str, row):
+    if row is None:
+        return None
+    return remember_user(row, None if row.email_match else models.normalize_name(qr_data))
+
+def forget_users(users):
+    """Drop cached lookups that a user write could change"""
+    for user in users:
+        cache.identity_cache.discard(
+            ("users", "id", user.id),
+            ("users", "email", user.email),
+            ("users", "name", models.normalize_name(user.name))
+        )
+
+def get_user_identity(db: Session, user_id: int):
+    identity = cache.identity_cache.get(("users", "id", user_id))
+    if identity is None:
+        row = db.execute(user_identity_select(models.User.id == user_id)).first()
+        identity = remember_user(row) if row else None
+    return identity
+
 def find_user_by_qr_data(db: Session, qr_data: str):
-    """Find user by QR code data (email or name)"""
-    # Try to find by email first
-    user = get_user_by_email(db, qr_data)
-    if user:
-        return user
-    
-    # If not found by email, try to find by name
-    user = db.query(models.User).filter(models.User.name == qr_data).first()
-    return user
-
-def get_comprehensive_attendance_for_class(db: Session, class_id: int):
-    """Get comprehensive attendance data for a class including all users"""
-    class_record = get_class(db, class_id)
-    if not class_record:
-        return []
-    
-    # Get all users
-    all_users = get_users(db)
-    
-    # Get existing attendance records for this class
-    existing_attendance = get_class_attendance(db, class_id)
-    attendance_dict = {att.user_id: att for att in existing_attendance}
-    
-    # Build comprehensive list
-    comprehensive_attendance = []
-    for user in all_users:
-        if user.role == "student":  # Only include students
-            attendance_record = attendance_dict.get(user.id)
-            comprehensive_attendance.append({
-                "id": user.id,
-                "name": user.name,
-                "email": user.email,
-                "status": attendance_record.status if attendance_record else "missing",
-                "checked_in_at": attendance_record.checked_in_at if attendance_record else None,
-                "attendance_id": attendance_record.id if attendance_record else None
-            })
-    
-    return comprehensive_attendance
+    """Find user by QR code data (email, or name ignoring case and spacing)"""
+    qr_data = qr_data.strip()
+    identity = cached_user_lookup(qr_data)
+    if identity is None:
+        identity = remember_user_lookup(qr_data, db.execute(user_lookup_statement(qr_data)).first())
+    return identity
+
+# Sort keys accepted by get_comprehensive_attendance_for_class
+ROSTER_SORTS = {
+    "id": (models.User.id,),
+    "name": (func.lower(models.User.name), models.User.id),
+    "status": (func.coalesce(models.Attendance.status, "missing"), func.lower(models.User.name), models.User.id),
+    "checked_in_at": (models.Attendance.checked_in_at, models.User.id),
+}
+
+def student_attendance_select(class_id: int, *columns):
+    """Students LEFT JOIN their attendance row for class_id, projecting only the given columns"""
+    return select(*columns).select_from(models.User).outerjoin(
+        models.Attendance,
+        and_(
+            models.Attendance.user_id == models.User.id,
+            models.Attendance.class_id == class_id
+        )
+    ).where(models.User.role == "student")
+
+def roster_statement(class_id: int, sort: str = "id", limit: int = None, offset: int = 0):
+    """The comprehensive roster query; empty when the class does not exist"""
+    stmt = student_attendance_select(
+        class_id,
+        models.User.id,
+        models.User.name,
+        models.User.email,
+        func.coalesce(models.Attendance.status, "missing").label("status"),
+        models.Attendance.checked_in_at,
+        models.Attendance.id.label("attendance_id")
+    ).where(exists().where(models.Class.id == class_id)).order_by(*ROSTER_SORTS[sort])
+    if offset:
+        stmt = stmt.offset(offset)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def get_comprehensive_attendance_for_class(db: Session, class_id: int, sort: str = "id", limit: int = None, offset: int = 0):
+    """Get comprehensive attendance data for a class including all students, in one query"""
+    return [dict(row._mapping) for row in db.execute(roster_statement(class_id, sort, limit, offset))]
 
 def create_user_for_attendance(db: Session, name: str, email: str = None):
     """Create a new user for attendance tracking"""
@@ -212,26 +917,189 @@ def create_user_for_attendance(db: Session, name: str, email: str = None):
         if existing_user:
             return existing_user
     
-    # Create new user
-    return create_user(db, name=name, email=email or f"{name.lower().replace(' ', '.')}@example.com", role="student")
+    # Create new user; a concurrent scan of the same new name may have just created it
+    email = email or placeholder_email(name)
+    try:
+        return create_user(db, name=name, email=email, role="student")
+    except IntegrityError:
+        db.rollback()
+        return get_user_by_email(db, email)
 
-def get_unchecked_students_for_class(db: Session, class_id: int):
-    """Get students who haven't been marked for attendance yet"""
-    # Get all students
-    all_students = db.query(models.User).filter(models.User.role == "student").all()
+def placeholder_email(name: str):
+    return f"{name.lower().replace(' ', '.')}@example.com"
+
+def resolve_users_for_qr_data(db: Session, qr_data_list: list):
+    """Resolve many QR payloads to (id, name) rows with set-based queries.
+
+    Follows scan_attendance: badge payloads resolve by id, anything else (or a legacy
+    badge with an unknown id) by email then name, and names that match nobody become
+    new students. Invalid badges, and signed badges of unknown users, are left out.
+    Returns the resolved rows and the users created; the caller updates the identity
+    cache and search index for those once its transaction commits.
+    """
+    resolved = {}
+    ids = {}
+    names = set()
+    for qr_data in set(qr_data_list):
+        try:
+            user_id, signed = qr.parse_user_qr(qr_data)
+        except qr.InvalidQRToken:
+            continue
+        if user_id is not None:
+            ids[qr_data] = (user_id, signed)
+        else:
+            names.add(qr_data)
     
-    # Get existing attendance records for this class
-    existing_attendance = get_class_attendance(db, class_id)
-    marked_user_ids = {att.user_id for att in existing_attendance}
+    by_id = {}
+    for chunk in _chunks({user_id for user_id, _ in ids.values()}):
+        by_id.update((row.id, row) for row in db.query(models.User.id, models.User.name).filter(models.User.id.in_(chunk)))
+    for qr_data, (user_id, signed) in ids.items():
+        if user_id in by_id:
+            resolved[qr_data] = by_id[user_id]
+        elif not signed:
+            names.add(qr_data)
     
-    # Return students who haven't been marked
-    unchecked_students = []
-    for student in all_students:
-        if student.id not in marked_user_ids:
-            unchecked_students.append({
-                "id": student.id,
-                "name": student.name,
-                "email": student.email
-            })
+    by_email = {}
+    by_name = {}
+    for chunk in _chunks(names):
+        emails = set(chunk) | {placeholder_email(name) for name in chunk}
+        rows = db.query(models.User.id, models.User.name, models.User.email, models.User.normalized_name).filter(
+            or_(models.User.email.in_(emails), models.User.normalized_name.in_({models.normalize_name(name) for name in chunk}))
+        ).order_by(models.User.id)
+        for row in rows:
+            by_email.setdefault(row.email, row)
+            by_name.setdefault(row.normalized_name, row)
+    
+    missing = []
+    for name in names:
+        row = by_email.get(name) or by_name.get(models.normalize_name(name)) or by_email.get(placeholder_email(name))
+        if row:
+            resolved[name] = row
+        else:
+            missing.append(name)
     
-    return unchecked_students 
\ No newline at end of file
+    # Create unknown names with chunked multi-row inserts; names sharing a placeholder email
+    # share a user. A user another station created meanwhile is skipped by the email
+    # conflict and read back instead of failing the batch.
+    created = []
+    if missing:
+        new_users = {}
+        for name in sorted(missing):
+            new_users.setdefault(placeholder_email(name), name)
+        table = models.User.__table__
+        insert_users = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+        rows = [{"name": name, "email": email, "role": "student"} for email, name in new_users.items()]
+        for chunk in _chunks(rows, IN_CHUNK_SIZE // (len(rows[0]) + 1)):
+            created += db.execute(
+                insert_users(table).values(chunk)
+                .on_conflict_do_nothing(index_elements=[table.c.email])
+                .returning(table.c.id, table.c.name, table.c.email)
+            ).all()
+        by_email = {row.email: row for row in created}
+        for chunk in _chunks(set(new_users) - set(by_email)):
+            by_email.update((row.email, row) for row in db.execute(
+                select(table.c.id, table.c.name, table.c.email).where(table.c.email.in_(chunk))
+            ))
+        resolved.update((name, by_email[placeholder_email(name)]) for name in missing)
+    return resolved, created
+
+def enroll_users(db: Session, entries: list, dry_run: bool = False):
+    """Match roster entries to existing users and create the rest with multi-row INSERTs.
+
+    entries are dicts of line, name, email, role and error (see roster.read_roster).
+    Existing users are looked up with chunked IN queries on email and normalized name,
+    never one query per row. Each entry gets a result:
+
+    - created: a new user
+    - matched: an existing user with this email and name, a walk-in whose placeholder
+      email is replaced by the roster's, or (without an email) the one user of that name
+    - conflict: the email belongs to someone else, or a name without email is ambiguous
+    - invalid: the row has an error, or no email and no user of that name exists
+    """
+    by_email, by_name = {}, {}
+    for chunk in _chunks({entry["email"] for entry in entries if entry["email"] and not entry["error"]}):
+        for row in db.execute(user_identity_select(models.User.email.in_(chunk))):
+            by_email[row.email] = row
+    names = {models.normalize_name(entry["name"]) for entry in entries if not entry["error"]}
+    for chunk in _chunks(names):
+        query = user_identity_select(models.User.normalized_name.in_(chunk)).add_columns(models.User.normalized_name)
+        for row in db.execute(query.order_by(models.User.id)):
+            by_name.setdefault(row.normalized_name, []).append(row)
+
+    results, new_users, claimed, seen = [], {}, {}, {}
+    for entry in entries:
+        result = {"line": entry["line"], "name": entry["name"], "email": entry["email"], "user_id": None, "detail": None}
+        results.append(result)
+        normalized = models.normalize_name(entry["name"]) if entry["name"] else None
+        email = entry["email"]
+        if entry["error"]:
+            result.update(result="invalid", detail=entry["error"])
+        elif email in seen:
+            first = seen[email]
+            if models.normalize_name(first["name"]) == normalized:
+                result.update(result="matched", detail=f"Same student as line {first['line']}")
+                result["first"] = first
+            else:
+                result.update(result="conflict", detail=f"Email also used for {first['name']} on line {first['line']}")
+        elif email in by_email:
+            seen[email] = result
+            user = by_email[email]
+            if models.normalize_name(user.name) == normalized:
+                result.update(result="matched", user_id=user.id)
+            else:
+                result.update(result="conflict", user_id=user.id, detail=f"Email belongs to {user.name}")
+        elif email:
+            seen[email] = result
+            walk_ins = [user for user in by_name.get(normalized, []) if user.email == placeholder_email(user.name)]
+            if len(walk_ins) == 1 and walk_ins[0].id not in claimed:
+                claimed[walk_ins[0].id] = (walk_ins[0], email)
+                result.update(result="matched", user_id=walk_ins[0].id, detail=f"Walk-in email {walk_ins[0].email} replaced")
+            else:
+                result["result"] = "created"
+                new_users[email] = (result, {"name": entry["name"], "email": email, "role": entry["role"]})
+        else:
+            users = by_name.get(normalized, [])
+            if len(users) == 1:
+                result.update(result="matched", user_id=users[0].id)
+            elif users:
+                result.update(result="conflict", detail=f"{len(users)} users are named {entry['name']}; add an email")
+            else:
+                result.update(result="invalid", detail="Email is required for a new student")
+
+    if not dry_run and (new_users or claimed):
+        table = models.User.__table__
+        rows = [values for _, values in new_users.values()]
+        created = []
+        for chunk in _chunks(rows, IN_CHUNK_SIZE // (len(rows[0]) + 1) if rows else IN_CHUNK_SIZE):
+            created += db.execute(
+                insert(table).values(chunk).returning(table.c.id, table.c.name, table.c.email, table.c.role)
+            ).all()
+        for row in created:
+            new_users[row.email][0]["user_id"] = row.id
+        if claimed:
+            db.execute(
+                update(table).where(table.c.id == bindparam("user_id")).values(email=bindparam("new_email")),
+                [{"user_id": user.id, "new_email": email} for user, email in claimed.values()]
+            )
+        db.commit()
+        forget_users(created + [user for user, _ in claimed.values()])
+        for row in created:
+            search.user_search_index.add(row.id, row.name, row.email, row.role)
+        for user, email in claimed.values():
+            search.user_search_index.update_email(user.id, email)
+
+    for result in results:
+        first = result.pop("first", None)
+        if first is not None:
+            result["user_id"] = first["user_id"]
+    return results
+
+def get_unchecked_students_for_class(db: Session, class_id: int):
+    """Get students who haven't been marked for attendance yet (an anti-join on attendance)"""
+    stmt = student_attendance_select(
+        class_id,
+        models.User.id,
+        models.User.name,
+        models.User.email
+    ).where(models.Attendance.id.is_(None)).order_by(models.User.id)
+    return [dict(row._mapping) for row in db.execute(stmt)]
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""AsyncSession versions of the crud functions behind the hot attendance endpoints.
+
+Statements are shared with crud so the two paths stay equivalent; only execution differs.
+"""
+from sqlalchemy import and_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from . import cache
+from . import crud
+from . import live
+from . import models
+from . import search
+
+async def get_user(db: AsyncSession, user_id: int):
+    return await db.get(models.User, user_id)
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    return (await db.scalars(select(models.User).where(models.User.email == email))).first()
+
+async def create_user(db: AsyncSession, name: str, email: str, role: str = "student"):
+    db_user = models.User(name=name, email=email, role=role)
+    db.add(db_user)
+    await db.commit()
+    crud.forget_users([db_user])
+    search.user_search_index.add(db_user.id, db_user.name, db_user.email, db_user.role)
+    return db_user
+
+async def get_user_identity(db: AsyncSession, user_id: int):
+    identity = cache.identity_cache.get(("users", "id", user_id))
+    if identity is None:
+        row = (await db.execute(crud.user_identity_select(models.User.id == user_id))).first()
+        identity = crud.remember_user(row) if row else None
+    return identity
+
+async def find_user_by_qr_data(db: AsyncSession, qr_data: str):
+    """Find user by QR code data (email, or name ignoring case and spacing)"""
+    qr_data = qr_data.strip()
+    identity = crud.cached_user_lookup(qr_data)
+    if identity is None:
+        identity = crud.remember_user_lookup(qr_data, (await db.execute(crud.user_lookup_statement(qr_data))).first())
+    return identity
+
+async def create_user_for_attendance(db: AsyncSession, name: str, email: str = None):
+    """Create a new user for attendance tracking"""
+    if email:
+        existing_user = await get_user_by_email(db, email)
+        if existing_user:
+            return existing_user
+    email = email or crud.placeholder_email(name)
+    try:
+        return await create_user(db, name=name, email=email, role="student")
+    except IntegrityError:
+        await db.rollback()
+        return await get_user_by_email(db, email)
+
+async def apply_attendance_deltas(db: AsyncSession, changes):
+    for stmt in crud.attendance_delta_statements(db.get_bind().dialect.name, changes):
+        await db.execute(stmt)
+
+async def mark_attendance(db: AsyncSession, class_id: int, user_id: int, status: str = "present"):
+    row = (await db.execute(crud.attendance_upsert(db, [{
+        "class_id": class_id,
+        "user_id": user_id,
+        "status": status,
+        "checked_in_at": datetime.now()
+    }]))).one()
+    await apply_attendance_deltas(db, crud.upserted_changes([row]))
+    await db.commit()
+    live.publish_marked([row])
+    return models.Attendance(**row._mapping)
+
+async def check_in_attendance(db: AsyncSession, class_id: int, user_id: int, status: str = "present"):
+    """Mark attendance unless the user is already present or late, or no longer exists; see crud.check_in_attendance"""
+    row = (await db.execute(crud.check_in_upsert(db, class_id, user_id, status))).first()
+    if row:
+        await apply_attendance_deltas(db, crud.upserted_changes([row]))
+    await db.commit()
+    if not row:
+        return None
+    live.publish_marked([row])
+    return row
+
+async def check_in_state(db: AsyncSession, class_id: int, user_id: int):
+    return (await db.execute(crud.check_in_state_select(class_id, user_id))).first()
+
+async def get_comprehensive_attendance_for_class(db: AsyncSession, class_id: int, sort: str = "id", limit: int = None, offset: int = 0):
+    result = await db.execute(crud.roster_statement(class_id, sort, limit, offset))
+    return [dict(row._mapping) for row in result]
@@ -1,7 +1,10 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -13,13 +16,228 @@ DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./tennis_academy.db")
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+pg8000://", 1)
 
+def _env_bool(name, default):
+    return os.getenv(name, str(default)).lower() in ("1", "true", "yes", "on")
+
+# Connection pool settings; pre-ping and recycle replace connections the hosted
+# PostgreSQL has dropped while idle, before a request trips over them
+POOL_OPTIONS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    "pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True),
+    "pool_use_lifo": _env_bool("DB_POOL_USE_LIFO", True),
+}
+
+# Upper bounds, in milliseconds, of the pool wait-time histogram buckets
+POOL_WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+class PoolStats:
+    """Counters for pool checkouts and the time callers waited to get a connection"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.checked_out = 0
+            self.max_checked_out = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.wait_buckets = [0] * (len(POOL_WAIT_BUCKETS_MS) + 1)
+
+    def record_wait(self, seconds):
+        milliseconds = seconds * 1000
+        index = next((i for i, bound in enumerate(POOL_WAIT_BUCKETS_MS) if milliseconds <= bound), len(POOL_WAIT_BUCKETS_MS))
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_buckets[index] += 1
+
+    def record_checkout(self):
+        with self._lock:
+            self.checkouts += 1
+            self.checked_out += 1
+            self.max_checked_out = max(self.max_checked_out, self.checked_out)
+
+    def record_checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.checked_out = max(self.checked_out - 1, 0)
+
+    def increment(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            bounds = [f"<={bound}ms" for bound in POOL_WAIT_BUCKETS_MS] + [f">{POOL_WAIT_BUCKETS_MS[-1]}ms"]
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "checked_out": self.checked_out,
+                "max_checked_out": self.max_checked_out,
+                "wait": {
+                    "count": self.wait_count,
+                    "mean_ms": round(self.wait_total / self.wait_count * 1000, 3) if self.wait_count else 0.0,
+                    "max_ms": round(self.wait_max * 1000, 3),
+                    "histogram": dict(zip(bounds, self.wait_buckets)),
+                },
+            }
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited, including any new connect"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_stats.record_wait(time.perf_counter() - start)
+
+# SQLite performance profile applied to every new connection; WAL lets readers run
+# alongside the single writer, and busy_timeout makes a second writer wait for the
+# lock instead of failing with "database is locked"
+SQLITE_PROFILE = _env_bool("SQLITE_PROFILE", True)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", str(-64 * 1024))),  # negative means KiB
+    "temp_store": "MEMORY",
+    "journal_size_limit": 64 * 1024 * 1024,  # WAL file size kept after a checkpoint
+}
+# Seconds between passive WAL checkpoints; 0 leaves it to SQLite's autocheckpoint
+SQLITE_CHECKPOINT_INTERVAL = float(os.getenv("SQLITE_CHECKPOINT_INTERVAL", "300"))
+
+def apply_sqlite_pragmas(dbapi_connection, connection_record=None):
+    """Connect-event listener that applies SQLITE_PRAGMAS"""
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
+
+def _uses_sqlite_profile(url):
+    return SQLITE_PROFILE and url.startswith("sqlite") and ":memory:" not in url
+
+# In-memory SQLite lives in a single connection, so keep SQLAlchemy's default pool there
+_engine_options = {} if ":memory:" in DATABASE_URL else {"poolclass": TimedQueuePool, **POOL_OPTIONS}
+
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+    connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {},
+    **_engine_options
 )
 
+if _uses_sqlite_profile(DATABASE_URL):
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+
+@event.listens_for(engine, "connect")
+def _count_connect(dbapi_connection, connection_record):
+    pool_stats.increment("connects")
+
+@event.listens_for(engine, "checkout")
+def _count_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_stats.record_checkout()
+
+@event.listens_for(engine, "checkin")
+def _count_checkin(dbapi_connection, connection_record):
+    pool_stats.record_checkin()
+
+@event.listens_for(engine, "invalidate")
+def _count_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.increment("invalidations")
+
+class WalCheckpointer:
+    """Daemon thread that runs a passive WAL checkpoint every SQLITE_CHECKPOINT_INTERVAL seconds.
+
+    Passive checkpoints never block readers or writers; with journal_size_limit they
+    keep the WAL from growing without bound between SQLite's own autocheckpoints.
+    """
+
+    def __init__(self, interval: float = SQLITE_CHECKPOINT_INTERVAL):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.interval or not _uses_sqlite_profile(DATABASE_URL) or self._thread:
+            return
+        self._thread = threading.Thread(target=self._run, name="wal-checkpoint", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def checkpoint(self):
+        with engine.connect() as connection:
+            return connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.checkpoint()
+            except Exception as e:
+                print(f"[ERROR] WAL checkpoint failed: {str(e)}")
+
+wal_checkpointer = WalCheckpointer()
+
+def get_pool_status():
+    """Current pool occupancy plus the collected statistics"""
+    pool = engine.pool
+    status = {"pool": pool.__class__.__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        status.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "checked_out": pool.checkedout(),
+        })
+    status["stats"] = pool_stats.snapshot()
+    return status
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# "sync" (default) or "async"; async serves the hot attendance endpoints from an AsyncSession
+# and needs aiosqlite (SQLite) or asyncpg (PostgreSQL) installed
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+def _async_database_url(url):
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql+pg8000://"):
+        return url.replace("postgresql+pg8000://", "postgresql+asyncpg://", 1)
+    return url
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", _async_database_url(DATABASE_URL))
+
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+    _async_engine_options = {} if ":memory:" in ASYNC_DATABASE_URL else {"poolclass": AsyncAdaptedQueuePool, **POOL_OPTIONS}
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **_async_engine_options)
+    if _uses_sqlite_profile(ASYNC_DATABASE_URL):
+        event.listen(async_engine.sync_engine, "connect", apply_sqlite_pragmas)
+    # Rows are returned after commit, so don't expire them
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -29,6 +247,10 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 if __name__ == "__main__":
     from . import models
     Base.metadata.create_all(bind=engine) 
\ No newline at end of file
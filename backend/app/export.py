@@ -0,0 +1,115 @@
+"""Streaming export of users, packages, classes and attendance as NDJSON or CSV.
+
+Rows are read through a server-side cursor EXPORT_BATCH_SIZE at a time and encoded
+as they arrive, so memory stays flat whatever the table size.
+
+NDJSON exports start with a header line, then one line per row tagged with its table:
+
+    {"format": "tennis-academy-export", "version": 1, "exported_at": "...", "tables": [...]}
+    {"table": "users", "row": {"id": 1, "name": "...", ...}}
+
+CSV holds a single table, with a header row of column names.
+"""
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time, timezone
+
+from sqlalchemy import select
+
+from . import models
+
+EXPORT_FORMAT = "tennis-academy-export"
+EXPORT_VERSION = 1
+
+# Rows fetched from the cursor, and written out, per batch
+EXPORT_BATCH_SIZE = 1000
+
+# Exported tables and columns in dependency order; users.normalized_name is derived from name
+EXPORT_TABLES = {
+    "packages": ["id", "name", "description", "price", "start_date", "end_date"],
+    "users": ["id", "name", "email", "role"],
+    "classes": ["id", "package_id", "date", "start_time", "end_time", "location", "cancelled"],
+    "attendance": ["id", "class_id", "user_id", "status", "checked_in_at"],
+}
+
+TABLES = {
+    "packages": models.Package.__table__,
+    "users": models.User.__table__,
+    "classes": models.Class.__table__,
+    "attendance": models.Attendance.__table__,
+}
+
+def _isoformat(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+# Only dates and times reach the default hook; everything else stays in the C encoder
+_encode_json = json.JSONEncoder(default=_isoformat).encode
+
+def table_batches(connection, table_name: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """Lists of row tuples for one table in id order, read with a server-side cursor"""
+    table = TABLES[table_name]
+    result = connection.execution_options(stream_results=True, yield_per=batch_size).execute(
+        select(*(table.c[name] for name in EXPORT_TABLES[table_name])).order_by(table.c.id)
+    )
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+def ndjson_chunks(connection, tables: list, batch_size: int = EXPORT_BATCH_SIZE):
+    """NDJSON text of an export, one string per batch of rows"""
+    header = {
+        "format": EXPORT_FORMAT,
+        "version": EXPORT_VERSION,
+        "exported_at": datetime.now(timezone.utc).isoformat(),
+        "tables": tables,
+    }
+    yield json.dumps(header) + "\n"
+    for table_name in tables:
+        columns = EXPORT_TABLES[table_name]
+        for batch in table_batches(connection, table_name, batch_size):
+            yield "".join(_encode_json({"table": table_name, "row": dict(zip(columns, row))}) + "\n" for row in batch)
+
+def csv_chunks(connection, table_name: str, batch_size: int = EXPORT_BATCH_SIZE):
+    """CSV text of one table, one string per batch of rows"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_TABLES[table_name])
+    for batch in table_batches(connection, table_name, batch_size):
+        # str() of dates and times is already ISO 8601; datetimes need the "T" separator
+        writer.writerows([value.isoformat() if isinstance(value, datetime) else value for value in row] for row in batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+def encode_chunks(chunks, compress: bool = False):
+    """UTF-8 bytes of text chunks, gzip-compressed incrementally when compress is set"""
+    if not compress:
+        for chunk in chunks:
+            yield chunk.encode()
+        return
+    gzip = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        data = gzip.compress(chunk.encode())
+        if data:
+            yield data
+    yield gzip.flush()
+
+def export_stream(engine, format: str = "ndjson", tables: list = None, compress: bool = False,
+                  batch_size: int = EXPORT_BATCH_SIZE):
+    """Bytes of an export, read on its own connection; CSV takes the first table only.
+
+    The connection is held until the generator is exhausted or closed, so the export
+    can be streamed after the request's session is gone.
+    """
+    tables = [name for name in EXPORT_TABLES if not tables or name in tables]
+    with engine.connect() as connection:
+        if format == "csv":
+            chunks = csv_chunks(connection, tables[0], batch_size)
+        else:
+            chunks = ndjson_chunks(connection, tables, batch_size)
+        yield from encode_chunks(chunks, compress)
@@ -0,0 +1,217 @@
+"""Bulk import of NDJSON bundles written by app.export.
+
+The bundle is read line by line and each table is inserted in batches of
+IMPORT_BATCH_SIZE rows with executemany, all in one transaction: a bad line rolls
+back everything. Ids in the bundle are remapped to the ids the rows get here, so
+classes follow their package and attendance its class and user. Users whose email
+already exists are matched rather than inserted.
+"""
+import csv
+import gzip
+import io
+import json
+from collections import namedtuple
+from datetime import date, datetime, time
+
+from sqlalchemy import Date, DateTime, Time, insert, select
+
+from . import cache, crud, export, search
+
+# Rows inserted per executemany
+IMPORT_BATCH_SIZE = 1000
+
+# Foreign keys remapped through the ids assigned to earlier tables
+FOREIGN_KEYS = {
+    "classes": {"package_id": "packages"},
+    "attendance": {"class_id": "classes", "user_id": "users"},
+}
+
+UserRow = namedtuple("UserRow", ["id", "name", "email", "role"])
+
+class BundleError(ValueError):
+    """A bundle line that cannot be imported; nothing from the bundle is kept"""
+
+    def __init__(self, line: int, message: str):
+        super().__init__(f"line {line}: {message}")
+        self.line = line
+
+def _converters(table_name: str):
+    """Parsers for the columns JSON carries as ISO 8601 strings"""
+    converters = {}
+    for name in export.EXPORT_TABLES[table_name]:
+        column_type = export.TABLES[table_name].c[name].type
+        if isinstance(column_type, DateTime):
+            converters[name] = datetime.fromisoformat
+        elif isinstance(column_type, Date):
+            converters[name] = date.fromisoformat
+        elif isinstance(column_type, Time):
+            converters[name] = time.fromisoformat
+    return converters
+
+CONVERTERS = {table_name: _converters(table_name) for table_name in export.EXPORT_TABLES}
+
+def open_bundle(fileobj):
+    """Text lines of a binary bundle, gunzipped when it starts with the gzip magic number"""
+    stream = io.BufferedReader(fileobj) if not hasattr(fileobj, "peek") else fileobj
+    if stream.peek(2)[:2] == b"\x1f\x8b":
+        stream = gzip.GzipFile(fileobj=stream, mode="rb")
+    return io.TextIOWrapper(stream, encoding="utf-8")
+
+def read_bundle(lines):
+    """(line number, table, row) for each row of a bundle, after checking its header"""
+    header = False
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise BundleError(number, f"invalid JSON ({e})")
+        if not header:
+            if not isinstance(record, dict) or record.get("format") != export.EXPORT_FORMAT or record.get("version") != export.EXPORT_VERSION:
+                raise BundleError(number, f"not a {export.EXPORT_FORMAT} version {export.EXPORT_VERSION} bundle")
+            header = True
+            continue
+        table_name, row = (record.get("table"), record.get("row")) if isinstance(record, dict) else (None, None)
+        if table_name not in export.EXPORT_TABLES or not isinstance(row, dict):
+            raise BundleError(number, f"expected {{\"table\": ..., \"row\": {{...}}}} for one of {', '.join(export.EXPORT_TABLES)}")
+        yield number, table_name, row
+    if not header:
+        raise BundleError(1, "empty bundle")
+
+def copy_rows(connection, table, rows: list):
+    """COPY rows into table through pg8000, in one round trip instead of one per row"""
+    columns = list(rows[0])
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(
+        [value.isoformat() if isinstance(value, (date, time)) else value for value in (row[name] for name in columns)]
+        for row in rows
+    )
+    cursor = connection.connection.driver_connection.cursor()
+    cursor.execute(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+        stream=io.BytesIO(buffer.getvalue().encode())
+    )
+
+class BundleImport:
+    """Inserts one bundle on a connection, remapping ids as it goes"""
+
+    def __init__(self, connection, batch_size: int = IMPORT_BATCH_SIZE):
+        self.connection = connection
+        self.batch_size = batch_size
+        self.ids = {table_name: {} for table_name in export.EXPORT_TABLES}
+        self.counts = {table_name: 0 for table_name in export.EXPORT_TABLES}
+        self.matched_users = 0
+        self.emails = set()
+        self.new_users = []
+        self.referenced = {target for keys in FOREIGN_KEYS.values() for target in keys.values()}
+
+    def values(self, table_name: str, number: int, row: dict):
+        """Insert parameters for a bundle row, with dates parsed and foreign keys remapped"""
+        values = {}
+        for name in export.EXPORT_TABLES[table_name]:
+            if name == "id":
+                continue
+            value = row.get(name)
+            try:
+                if value is not None and name in CONVERTERS[table_name]:
+                    value = CONVERTERS[table_name][name](value)
+            except (TypeError, ValueError):
+                raise BundleError(number, f"invalid {table_name}.{name} {value!r}")
+            if name in FOREIGN_KEYS.get(table_name, {}):
+                target = FOREIGN_KEYS[table_name][name]
+                if value not in self.ids[target]:
+                    raise BundleError(number, f"{table_name}.{name} {value!r} is not a {target} id earlier in the bundle")
+                value = self.ids[target][value]
+            values[name] = value
+        return values
+
+    def insert(self, table_name: str, batch: list):
+        """Insert one batch of (line number, row) and record the ids the rows got"""
+        rows = [(number, row, self.values(table_name, number, row)) for number, row in batch]
+        if table_name == "users":
+            rows = self.match_users(rows)
+        if not rows:
+            return
+        table = export.TABLES[table_name]
+        if table_name not in self.referenced:
+            # Nothing refers to these rows, so their ids aren't needed back
+            if self.connection.dialect.driver == "pg8000":
+                copy_rows(self.connection, table, [values for _, _, values in rows])
+            else:
+                self.connection.execute(insert(table), [values for _, _, values in rows])
+            self.counts[table_name] += len(rows)
+            return
+
+        # RETURNING order isn't guaranteed for a batch (SQLite makes no promise), so the
+        # rows are matched back to the bundle by their values; identical rows are
+        # interchangeable
+        columns = list(rows[0][2])
+        inserted = self.connection.execute(
+            insert(table).returning(table.c.id, *(table.c[name] for name in columns)),
+            [values for _, _, values in rows]
+        ).all()
+        new_ids = {}
+        for new_row in inserted:
+            new_ids.setdefault(tuple(new_row[1:]), []).append(new_row.id)
+        for number, row, values in rows:
+            new_id = new_ids[tuple(values[name] for name in columns)].pop()
+            if row.get("id") is not None:
+                self.ids[table_name][row["id"]] = new_id
+            if table_name == "users":
+                self.new_users.append(UserRow(new_id, values["name"], values["email"], values["role"]))
+        self.counts[table_name] += len(inserted)
+
+    def match_users(self, rows: list):
+        """Map users whose email is already taken to the existing user; return the rest"""
+        users = export.TABLES["users"]
+        existing = dict(self.connection.execute(
+            select(users.c.email, users.c.id).where(users.c.email.in_({values["email"] for _, _, values in rows}))
+        ).all())
+        remaining = []
+        for number, row, values in rows:
+            if values["email"] in self.emails:
+                raise BundleError(number, f"duplicate email {values['email']!r}")
+            self.emails.add(values["email"])
+            if values["email"] in existing:
+                if row.get("id") is not None:
+                    self.ids["users"][row["id"]] = existing[values["email"]]
+                self.matched_users += 1
+            else:
+                remaining.append((number, row, values))
+        return remaining
+
+    def run(self, records):
+        table_name, batch = None, []
+        for number, record_table, row in records:
+            if record_table != table_name or len(batch) >= self.batch_size:
+                if batch:
+                    self.insert(table_name, batch)
+                table_name, batch = record_table, []
+            batch.append((number, row))
+        if batch:
+            self.insert(table_name, batch)
+        return {**self.counts, "users_matched": self.matched_users}
+
+def import_bundle(engine, fileobj, batch_size: int = IMPORT_BATCH_SIZE):
+    """Import a (possibly gzipped) NDJSON bundle in one transaction.
+
+    Returns the rows inserted per table plus users_matched. Raises BundleError, or the
+    database's error, after rolling back.
+    """
+    with engine.begin() as connection:
+        bundle = BundleImport(connection, batch_size)
+        counts = bundle.run(read_bundle(open_bundle(fileobj)))
+        if counts["attendance"]:
+            # Imported classes all belong to imported packages, so whole packages are refreshed
+            for stmt in crud.attendance_stats_statements(
+                connection.dialect.name, bundle.ids["classes"].values(), package_ids=bundle.ids["packages"].values()
+            ):
+                connection.execute(stmt)
+
+    cache.response_cache.invalidate("packages")
+    cache.response_cache.invalidate("classes")
+    crud.forget_users(bundle.new_users)
+    for row in bundle.new_users:
+        search.user_search_index.add(row.id, row.name, row.email, row.role)
+    return counts
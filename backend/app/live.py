@@ -0,0 +1,91 @@
+import asyncio
+import threading
+from dataclasses import dataclass, field
+
+# Events buffered per subscriber before it is treated as a slow consumer and dropped
+LIVE_QUEUE_SIZE = 100
+
+@dataclass(eq=False)
+class Subscription:
+    class_id: int
+    loop: asyncio.AbstractEventLoop
+    queue: asyncio.Queue = field(default_factory=lambda: asyncio.Queue(maxsize=LIVE_QUEUE_SIZE))
+    dropped: bool = False
+
+    async def get(self):
+        """Next event, or None once the subscription has been dropped"""
+        return await self.queue.get()
+
+class RosterHub:
+    """Fans attendance-change events out to the live subscribers of each class.
+
+    publish may be called from any thread (sync endpoints run in the threadpool);
+    delivery happens on each subscriber's event loop. Subscribers only see events
+    published by the same process.
+    """
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, class_id: int):
+        subscription = Subscription(class_id=class_id, loop=asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(class_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.class_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.class_id]
+
+    def publish(self, class_id: int, event: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(class_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.loop.call_soon_threadsafe(self._deliver, subscription, event)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(subscription)
+
+    def _deliver(self, subscription: Subscription, event: dict):
+        if subscription.dropped:
+            return
+        try:
+            subscription.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: discard its backlog and end its stream so the client resyncs
+            subscription.dropped = True
+            self.unsubscribe(subscription)
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(None)
+
+hub = RosterHub()
+
+def _record(row):
+    return {
+        "user_id": row.user_id,
+        "status": row.status,
+        "checked_in_at": row.checked_in_at.isoformat() if row.checked_in_at else None,
+        "attendance_id": row.id
+    }
+
+def publish_marked(rows):
+    """Publish written attendance rows, one event per class"""
+    by_class = {}
+    for row in rows:
+        by_class.setdefault(row.class_id, []).append(_record(row))
+    for class_id, records in by_class.items():
+        hub.publish(class_id, {"type": "attendance", "class_id": class_id, "records": records})
+
+def publish_deleted(class_id: int, user_ids=None):
+    """Publish removed attendance; user_ids of None means the whole class was cleared"""
+    if user_ids is None:
+        hub.publish(class_id, {"type": "cleared", "class_id": class_id})
+    else:
+        hub.publish(class_id, {"type": "deleted", "class_id": class_id, "user_ids": list(user_ids)})
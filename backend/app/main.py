@@ -1,19 +1,29 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.exc import DBAPIError, IntegrityError
 from sqlalchemy.orm import Session
-from typing import List
-import qrcode
-import io
+from typing import List, Optional
+import asyncio
 import base64
+import csv
+import json
 from datetime import date, datetime, time
+import io
 import os
+import tempfile
 from dotenv import load_dotenv
 
-from . import crud, models, schemas
-from .database import SessionLocal, engine
+from . import badges, cache, crud, export, importer, live, metrics, models, qr, roster, schemas, search
+from .database import DB_MODE, SessionLocal, engine, get_pool_status, wal_checkpointer
 
 load_dotenv()
 
+if not qr.QR_SIGNING_KEYS:
+    print("[WARN] Neither QR_SIGNING_KEYS nor SECRET_KEY is set; signed badges are disabled")
+
 # Create database tables
 models.Base.metadata.create_all(bind=engine)
 
@@ -27,9 +37,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
     allow_origin_regex=r"https?://(localhost|127\.0\.0\.1|192\.168\.1\.171)(:\d+)?",
 )
 
+# Request counts, latency histograms and a Server-Timing header; scraped at /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+
+@app.on_event("startup")
+def start_wal_checkpointer():
+    wal_checkpointer.start()
+
+@app.on_event("shutdown")
+def stop_wal_checkpointer():
+    wal_checkpointer.stop()
+
+@app.on_event("shutdown")
+def stop_badge_workers():
+    badges.shutdown_render_pool()
+
+# The hot attendance endpoints (mark, comprehensive, scan) have sync and async
+# handlers; only the set matching DB_MODE is registered
+if DB_MODE != "async":
+    from .sync_routes import router as sync_router
+    app.include_router(sync_router)
+else:
+    from .async_routes import router as async_router
+    from .database import async_engine
+    app.include_router(async_router)
+    metrics.instrument_engine(async_engine.sync_engine)
+
+    @app.on_event("shutdown")
+    async def dispose_async_engine():
+        # Pooled aiosqlite connections each hold a worker thread that would block exit
+        await async_engine.dispose()
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -38,6 +81,54 @@ def get_db():
     finally:
         db.close()
 
+def etag_matches(request: Request, etag: str):
+    """True when the request's If-None-Match already covers etag"""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def encode_cursor(*values):
+    """Opaque keyset-pagination cursor for the sort key of the last row returned"""
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+def decode_cursor(cursor: str, *converters):
+    """Decode a cursor into a tuple, applying one converter per value"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(converters):
+            raise ValueError("cursor length mismatch")
+        return tuple(convert(value) for convert, value in zip(converters, values))
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def paginate(rows: list, limit: Optional[int], headers, cursor_values):
+    """Trim a limit + 1 fetch to limit rows and set X-Next-Cursor when another page exists"""
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(*cursor_values(rows[-1]))
+    return rows
+
+def cached_response(request: Request, key: tuple, load):
+    """Serve a JSON response from the response cache, loading it on a miss.
+
+    load(headers) returns the response data and may add headers to cache with it. A
+    matching If-None-Match gets a 304 without touching the database.
+    """
+    entry = cache.response_cache.get(key)
+    if entry is None:
+        generation = cache.response_cache.generation(key[0])
+        headers = {}
+        body = JSONResponse(jsonable_encoder(load(headers))).body
+        entry = cache.CachedResponse(body=body, headers=headers)
+        cache.response_cache.set(key, entry, generation)
+    
+    headers = {**entry.headers, "ETag": entry.etag}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 # Coach authentication
 COACH_PASSWORD = os.getenv("COACH_PASSWORD", "tennis123")
 
@@ -65,8 +156,44 @@ def create_user(request: dict, db: Session = Depends(get_db)):
     return crud.create_user(db, name, email, role)
 
 @app.get("/api/users")
-def list_users(db: Session = Depends(get_db)):
-    return crud.get_users(db)
+def list_users(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List users by id; pass limit to page through them with the X-Next-Cursor header"""
+    after_id = decode_cursor(cursor, int)[0] if cursor else None
+    users = crud.get_users(db, limit=limit + 1 if limit else None, after_id=after_id)
+    return paginate(users, limit, response.headers, lambda user: [user.id])
+
+@app.post("/api/users/roster", response_model=schemas.RosterImportResponse)
+def enroll_roster(file: UploadFile = File(...), dry_run: bool = False, db: Session = Depends(get_db)):
+    """Enroll students from a roster CSV (columns name or first_name/last_name, email, role).
+
+    Rows are matched to existing users by email, or by name when they have no email;
+    the rest are created together. Reports each row as created, matched, conflict or
+    invalid; with dry_run nothing is written.
+    """
+    try:
+        entries = list(roster.read_roster(io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")))
+    except (roster.RosterError, csv.Error, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read roster: {e}")
+    try:
+        results = crud.enroll_users(db, entries, dry_run=dry_run)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Users were created concurrently; nothing was enrolled, try again")
+    counts = {result: sum(1 for row in results if row["result"] == result) for result in ("created", "matched", "conflict", "invalid")}
+    return schemas.RosterImportResponse(
+        dry_run=dry_run, created=counts["created"], matched=counts["matched"], conflicts=counts["conflict"],
+        invalid=counts["invalid"], results=results
+    )
+
+@app.get("/api/users/search")
+def search_users(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=50), db: Session = Depends(get_db)):
+    """Typeahead: existing students ranked by how closely their name matches q"""
+    return search.user_search_index.search(db, q, limit)
 
 @app.get("/api/users/{user_id}")
 def get_user(user_id: int, db: Session = Depends(get_db)):
@@ -75,21 +202,93 @@ def get_user(user_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+@app.get("/api/users/{user_id}/qr.png")
+def get_user_qr_png(user_id: int, request: Request, db: Session = Depends(get_db)):
+    """Serve a user's QR badge as a PNG from the render cache"""
+    user = crud.get_user(db, user_id)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    qr_data = qr.user_qr_data(user)
+    etag = qr.qr_etag(qr_data)
+    # A week: long enough to skip repeat downloads, short enough to pick up a renamed user
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=604800"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=qr.render_qr_png(qr_data), media_type="image/png", headers=headers)
+
 # Package endpoints
 @app.post("/api/packages")
 def create_package(name: str, description: str, price: float, start_date: date, end_date: date, db: Session = Depends(get_db)):
     return crud.create_package(db, name, description, price, start_date, end_date)
 
 @app.get("/api/packages")
-def list_packages(db: Session = Depends(get_db)):
-    return crud.get_packages(db)
+def list_packages(request: Request, db: Session = Depends(get_db)):
+    return cached_response(request, ("packages", "list"), lambda headers: crud.get_packages(db))
 
 @app.get("/api/packages/{package_id}")
-def get_package(package_id: int, db: Session = Depends(get_db)):
+def get_package(package_id: int, request: Request, db: Session = Depends(get_db)):
+    def load(headers):
+        package = crud.get_package(db, package_id)
+        if not package:
+            raise HTTPException(status_code=404, detail="Package not found")
+        return package
+    return cached_response(request, ("packages", "get", package_id), load)
+
+@app.get("/api/packages/{package_id}/classes")
+def list_package_classes(
+    package_id: int,
+    request: Request,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    cancelled: Optional[bool] = None,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List a package's classes by date, optionally filtered and paged with the X-Next-Cursor header"""
+    after = decode_cursor(cursor, date.fromisoformat, int) if cursor else None
+    def load(headers):
+        classes = crud.get_classes_by_package(
+            db, package_id, start_date=start_date, end_date=end_date, cancelled=cancelled,
+            limit=limit + 1 if limit else None, after=after
+        )
+        return paginate(classes, limit, headers, lambda class_obj: [class_obj.date.isoformat(), class_obj.id])
+    key = ("classes", "package", package_id, start_date, end_date, cancelled, limit, after)
+    return cached_response(request, key, load)
+
+def check_weekdays(weekdays: List[str]):
+    invalid = [day for day in weekdays if day not in crud.WEEKDAYS]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Invalid weekdays {invalid}. Must be one of {', '.join(crud.WEEKDAYS)}")
+
+@app.post("/api/packages/{package_id}/schedule", response_model=schemas.ScheduleGenerateResponse)
+def generate_package_schedule(package_id: int, request: schemas.ScheduleGenerateRequest, db: Session = Depends(get_db)):
+    """Create a package's season of classes from weekday/time/location slots.
+
+    Classes that already exist at the same date, start time and location are skipped;
+    with preview the classes that would be created are returned and nothing is written.
+    """
     package = crud.get_package(db, package_id)
     if not package:
         raise HTTPException(status_code=404, detail="Package not found")
-    return package
+    start_date = request.start_date or package.start_date
+    end_date = request.end_date or package.end_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date is before start_date")
+    for slot in request.slots:
+        check_weekdays(slot.weekdays)
+        if slot.end_time <= slot.start_time:
+            raise HTTPException(status_code=400, detail="Slot end_time must be after start_time")
+
+    classes, skipped = crud.generate_schedule(
+        db, package_id, [slot.model_dump() for slot in request.slots], start_date, end_date,
+        skip_dates=request.skip_dates, preview=request.preview
+    )
+    return schemas.ScheduleGenerateResponse(
+        preview=request.preview, created=len(classes), skipped_existing=skipped,
+        classes=[schemas.ScheduledClass.model_validate(class_obj) for class_obj in classes]
+    )
 
 # Class endpoints
 @app.post("/api/classes")
@@ -99,16 +298,106 @@ def create_class(package_id: int, date: date, start_time: str, end_time: str, lo
     end_time_obj = datetime.strptime(end_time, "%H:%M").time()
     return crud.create_class(db, package_id, date, start_time_obj, end_time_obj, location)
 
+def class_criteria(selection: schemas.ClassSelection, db: Session):
+    """WHERE criteria for a bulk class operation; refuses to match every class"""
+    if selection.package_id is None and not selection.start_date and not selection.end_date and selection.location is None:
+        raise HTTPException(status_code=400, detail="Select classes by package_id, date range or location")
+    if selection.weekdays:
+        check_weekdays(selection.weekdays)
+    return crud.class_selection(
+        db, package_id=selection.package_id, start_date=selection.start_date, end_date=selection.end_date,
+        location=selection.location, weekdays=selection.weekdays
+    )
+
+def bulk_response(selection: schemas.ClassSelection, rows: list):
+    return schemas.ClassBulkResponse(
+        preview=selection.preview, matched=len(rows),
+        classes=[schemas.Class.model_validate(row._mapping) for row in rows]
+    )
+
+# Bulk operations run as a single UPDATE; set preview to see the matching classes first
+@app.post("/api/classes/bulk/shift", response_model=schemas.ClassBulkResponse)
+def shift_classes(request: schemas.ClassShiftRequest, db: Session = Depends(get_db)):
+    """Move the selected classes by a number of days (negative moves them earlier)"""
+    criteria = class_criteria(request, db)
+    return bulk_response(request, crud.shift_classes(db, criteria, request.days, preview=request.preview))
+
+@app.post("/api/classes/bulk/reschedule", response_model=schemas.ClassBulkResponse)
+def reschedule_classes(request: schemas.ClassRescheduleRequest, db: Session = Depends(get_db)):
+    """Give the selected classes new times and/or a new location"""
+    if request.new_start_time is None and request.new_end_time is None and request.new_location is None:
+        raise HTTPException(status_code=400, detail="Give new_start_time, new_end_time or new_location")
+    if request.new_start_time and request.new_end_time and request.new_end_time <= request.new_start_time:
+        raise HTTPException(status_code=400, detail="new_end_time must be after new_start_time")
+    criteria = class_criteria(request, db)
+    rows = crud.reschedule_classes(
+        db, criteria, start_time=request.new_start_time, end_time=request.new_end_time,
+        location=request.new_location, preview=request.preview
+    )
+    return bulk_response(request, rows)
+
+@app.post("/api/classes/bulk/cancel", response_model=schemas.ClassBulkResponse)
+def cancel_classes(request: schemas.ClassCancelRequest, db: Session = Depends(get_db)):
+    """Cancel the selected classes, or restore them with cancelled=false"""
+    criteria = class_criteria(request, db)
+    return bulk_response(request, crud.cancel_classes(db, criteria, cancelled=request.cancelled, preview=request.preview))
+
 @app.get("/api/classes")
-def list_classes(db: Session = Depends(get_db)):
-    return crud.get_classes(db)
+def list_classes(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """List classes by id; pass limit to page through them with the X-Next-Cursor header"""
+    after_id = decode_cursor(cursor, int)[0] if cursor else None
+    def load(headers):
+        classes = crud.get_classes(db, limit=limit + 1 if limit else None, after_id=after_id)
+        return paginate(classes, limit, headers, lambda class_obj: [class_obj.id])
+    return cached_response(request, ("classes", "list", limit, after_id), load)
 
 @app.get("/api/classes/{class_id}")
-def get_class(class_id: int, db: Session = Depends(get_db)):
-    class_obj = crud.get_class(db, class_id)
-    if not class_obj:
-        raise HTTPException(status_code=404, detail="Class not found")
-    return class_obj
+def get_class(class_id: int, request: Request, db: Session = Depends(get_db)):
+    def load(headers):
+        class_obj = crud.get_class(db, class_id)
+        if not class_obj:
+            raise HTTPException(status_code=404, detail="Class not found")
+        return class_obj
+    return cached_response(request, ("classes", "get", class_id), load)
+
+# Seconds between SSE keepalive comments, so proxies don't close an idle stream
+LIVE_KEEPALIVE_SECONDS = 15
+
+@app.get("/api/classes/{class_id}/live")
+async def stream_class_roster(class_id: int):
+    """Server-Sent Events stream of attendance changes for a class.
+
+    Sends "attendance" events (records written), "deleted" (user_ids removed) and
+    "cleared" (every record removed). A client that falls too far behind gets a
+    "resync" event and the stream ends; it should refetch the roster and reconnect.
+    """
+    async def events():
+        subscription = live.hub.subscribe(class_id)
+        try:
+            yield ": connected\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event is None:
+                    yield f"event: resync\ndata: {json.dumps({'class_id': class_id})}\n\n"
+                    break
+                yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            live.hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.post("/api/classes/{class_id}/cancel")
 def cancel_class(class_id: int, db: Session = Depends(get_db)):
@@ -122,25 +411,23 @@ def cancel_class(class_id: int, db: Session = Depends(get_db)):
 def get_attendance(class_id: int, db: Session = Depends(get_db)):
     return crud.get_attendance(db, class_id)
 
-@app.post("/api/attendance/mark")
-def mark_attendance(request: dict, db: Session = Depends(get_db)):
-    class_id = request.get("class_id")
-    user_id = request.get("user_id")
-    status = request.get("status", "present")
+@app.post("/api/attendance/mark_bulk", response_model=schemas.AttendanceBulkMarkResponse)
+def mark_attendance_bulk(request: schemas.AttendanceBulkMarkRequest, db: Session = Depends(get_db)):
+    """Mark many students for a class in one transaction and return the updated counts"""
+    invalid = {entry.status for entry in request.entries} - {"present", "late", "missing"}
+    if invalid:
+        raise HTTPException(status_code=400, detail="Invalid status. Must be 'present', 'late', or 'missing'")
     
-    if not class_id or not user_id:
-        raise HTTPException(status_code=400, detail="class_id and user_id are required")
+    if not crud.get_class(db, request.class_id):
+        raise HTTPException(status_code=404, detail="Class not found")
     
-    if status not in ["present", "late", "missing"]:
-        raise HTTPException(status_code=400, detail="Invalid status. Must be 'present', 'late', or 'missing'")
+    user_ids = {entry.user_id for entry in request.entries}
+    unknown = user_ids - crud.get_user_ids(db, list(user_ids))
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Users not found: {sorted(unknown)}")
     
-    return crud.mark_attendance(db, class_id, user_id, status)
-
-@app.get("/api/attendance/comprehensive/{class_id}")
-def get_comprehensive_attendance(class_id: int, db: Session = Depends(get_db)):
-    """Get comprehensive attendance data for a class"""
-    attendance_data = crud.get_comprehensive_attendance_for_class(db, class_id)
-    return attendance_data
+    results, counts = crud.mark_attendance_bulk(db, request.class_id, [entry.model_dump() for entry in request.entries])
+    return schemas.AttendanceBulkMarkResponse(results=results, counts=counts)
 
 @app.get("/api/attendance/unchecked/{class_id}")
 def get_unchecked_students(class_id: int, db: Session = Depends(get_db)):
@@ -187,12 +474,72 @@ def delete_attendance(class_id: int, user_id: int, db: Session = Depends(get_db)
 @app.delete("/api/attendance/class/{class_id}/all")
 def delete_all_attendance_for_class(class_id: int, db: Session = Depends(get_db)):
     """Delete all attendance records for a class"""
-    records = db.query(models.Attendance).filter(models.Attendance.class_id == class_id).all()
-    count = len(records)
-    for record in records:
-        db.delete(record)
-    db.commit()
-    return {"message": f"Deleted {count} attendance record(s) for class_id {class_id}."}
+    count = crud.clear_class_attendance(db, class_id)
+    return {"message": f"Deleted {count} attendance record(s) for class_id {class_id}.", "deleted": count}
+
+@app.delete("/api/packages/{package_id}/attendance")
+def delete_package_attendance(
+    package_id: int,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    db: Session = Depends(get_db)
+):
+    """Delete the attendance of a package's classes, optionally only those in a date range"""
+    if not crud.get_package(db, package_id):
+        raise HTTPException(status_code=404, detail="Package not found")
+    counts = crud.clear_package_attendance(db, package_id, start_date=start_date, end_date=end_date)
+    return {"deleted": sum(counts.values()), "classes": counts}
+
+@app.delete("/api/attendance")
+def purge_attendance(
+    before: date,
+    chunk_size: int = Query(crud.PURGE_CHUNK_SIZE, ge=1, le=100000),
+    dry_run: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Purge attendance and scan receipts of classes dated before a date, in bounded chunks"""
+    if dry_run:
+        attendance, receipts = crud.count_attendance_before(db, before)
+        return {"dry_run": True, "attendance": attendance, "scan_receipts": receipts}
+    return {"dry_run": False, **crud.purge_attendance_before(db, before, chunk_size=chunk_size)}
+
+# Attendance report endpoints, served from the aggregate tables
+@app.get("/api/reports/classes", response_model=List[schemas.ClassAttendanceSummary])
+def class_attendance_report(
+    date: Optional[date] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    package_id: Optional[int] = None,
+    db: Session = Depends(get_db)
+):
+    """Headcounts per class on a date (today by default) or over a date range"""
+    if date is not None and (start_date or end_date):
+        raise HTTPException(status_code=400, detail="Pass either date or start_date/end_date")
+    start_date = date or start_date or end_date or datetime.now().date()
+    end_date = date or end_date or start_date
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    return crud.get_class_attendance_report(db, start_date, end_date, package_id=package_id)
+
+@app.get("/api/reports/packages/{package_id}", response_model=schemas.PackageAttendanceReport)
+def package_attendance_report(package_id: int, as_of: Optional[date] = None, db: Session = Depends(get_db)):
+    """Attendance of every student in a package, with their rate over the classes held so far"""
+    if not crud.get_package(db, package_id):
+        raise HTTPException(status_code=404, detail="Package not found")
+    as_of = as_of or datetime.now().date()
+    classes_held, rows = crud.get_package_attendance_report(db, package_id, as_of)
+    students = [
+        {**row._mapping, "attendance_rate": round(row.attended / classes_held, 3) if classes_held else None}
+        for row in rows
+    ]
+    return {"package_id": package_id, "as_of": as_of, "classes_held": classes_held, "students": students}
+
+@app.get("/api/reports/users/{user_id}", response_model=List[schemas.UserPackageSummary])
+def user_attendance_report(user_id: int, db: Session = Depends(get_db)):
+    """A student's attendance per package"""
+    if not crud.get_user(db, user_id):
+        raise HTTPException(status_code=404, detail="User not found")
+    return crud.get_user_attendance_report(db, user_id)
 
 # QR Code endpoints
 @app.post("/api/generate_qr", response_model=schemas.QRGenerateResponse)
@@ -200,18 +547,10 @@ def generate_qr_code(request: schemas.QRGenerateRequest, db: Session = Depends(g
     try:
         print(f"[DEBUG] QR request for name: {request.name}")
         
-        # Find user by name - try exact match first
+        # Find user by email or by name, ignoring case and spacing
         user = crud.find_user_by_qr_data(db, request.name)
         
-        # If not found, try case-insensitive search
-        if not user:
-            print(f"[DEBUG] Exact match not found, trying case-insensitive search")
-            from sqlalchemy import func
-            user = db.query(models.User).filter(
-                func.lower(models.User.name) == func.lower(request.name)
-            ).first()
-        
-        # If still not found, create a new user
+        # If not found, create a new user
         if not user:
             print(f"[DEBUG] User not found, creating new user for name: {request.name}")
             user = crud.create_user_for_attendance(db, request.name)
@@ -220,21 +559,8 @@ def generate_qr_code(request: schemas.QRGenerateRequest, db: Session = Depends(g
         print(f"[DEBUG] User ID: {user.id}, Name: {user.name}")
         
         # Create QR code data (user ID and name)
-        qr_data = f"{user.id}:{user.name}"
-        
-        # Generate QR code image
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(qr_data)
-        qr.make(fit=True)
+        qr_data = qr.user_qr_data(user)
         
-        img = qr.make_image(fill_color="black", back_color="white")
-        
-        # Convert to base64
-        buffer = io.BytesIO()
-        img.save(buffer, format='PNG')
-        qr_base64 = base64.b64encode(buffer.getvalue()).decode()
-        
-        print("[DEBUG] QR code generated successfully")
         return schemas.QRGenerateResponse(
             qr_data=qr_data,
             user_info={
@@ -252,74 +578,129 @@ def generate_qr_code(request: schemas.QRGenerateRequest, db: Session = Depends(g
         print(f"[ERROR] Full traceback: {traceback.format_exc()}")
         raise HTTPException(status_code=500, detail=f"QR generation failed: {str(e)}")
 
-@app.post("/api/attendance/scan", response_model=schemas.AttendanceScanResponse)
-def scan_attendance(request: schemas.AttendanceScanRequest, db: Session = Depends(get_db)):
-    """Scan QR code and mark attendance"""
-    try:
-        user = None
-        is_registered = False
-        registration_message = None
-        
-        # Try to parse QR data as "user_id:user_name" (registered user)
+@app.get("/api/badges")
+def download_badges(
+    package_id: Optional[int] = None,
+    user_ids: Optional[List[int]] = Query(None),
+    format: str = "pdf",
+    db: Session = Depends(get_db)
+):
+    """Stream QR badges as a printable PDF or a ZIP of PNGs.
+
+    Covers user_ids if given, otherwise the students of package_id, otherwise every student.
+    """
+    if format not in ["pdf", "zip"]:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be 'pdf' or 'zip'")
+    if package_id is not None and not crud.get_package(db, package_id):
+        raise HTTPException(status_code=404, detail="Package not found")
+    
+    users = crud.get_badge_users(db, package_id=package_id, user_ids=user_ids)
+    filename = f"badges-package-{package_id}" if package_id is not None else "badges"
+    if format == "pdf":
+        content, media_type = badges.stream_badge_pdf(users), "application/pdf"
+    else:
+        content, media_type = badges.stream_badge_zip(users), "application/zip"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{format}"'}
+    )
+
+@app.post("/api/attendance/scan/sync", response_model=schemas.ScanSyncResponse)
+def sync_scans(request: schemas.ScanSyncRequest, db: Session = Depends(get_db)):
+    """Apply scans queued offline by a scanning station; replayed idempotency keys are no-ops"""
+    if any(scan.status not in ["present", "late", "missing"] for scan in request.scans):
+        raise HTTPException(status_code=400, detail="Invalid status. Must be 'present', 'late', or 'missing'")
+    
+    scans = []
+    for scan in request.scans:
+        checked_in_at = scan.scanned_at
+        if checked_in_at.tzinfo:
+            # Stored timestamps are naive local time, like datetime.now()
+            checked_in_at = checked_in_at.astimezone().replace(tzinfo=None)
+        scans.append({
+            "idempotency_key": scan.idempotency_key,
+            "qr_data": scan.qr_data,
+            "class_id": scan.class_id,
+            "status": scan.status,
+            "checked_in_at": checked_in_at
+        })
+    
+    results = crud.apply_queued_scans(db, scans)
+    outcomes = [result["result"] for result in results]
+    return schemas.ScanSyncResponse(
+        results=results,
+        applied=outcomes.count("applied"),
+        already_present=outcomes.count("already_present"),
+        duplicates=outcomes.count("duplicate"),
+        rejected=outcomes.count("rejected")
+    )
+
+# Export endpoints
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+@app.get("/api/export")
+def export_data(
+    format: str = "ndjson",
+    tables: Optional[str] = None,
+    gzip: bool = False
+):
+    """Stream users, packages, classes and attendance as NDJSON, or one table as CSV.
+
+    tables is a comma-separated subset of users, packages, classes and attendance.
+    """
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid format. Must be 'ndjson' or 'csv'")
+    selected = [name.strip() for name in tables.split(",") if name.strip()] if tables else list(export.EXPORT_TABLES)
+    unknown = set(selected) - set(export.EXPORT_TABLES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown tables: {sorted(unknown)}")
+    if format == "csv" and len(selected) != 1:
+        raise HTTPException(status_code=400, detail="CSV exports take exactly one table")
+
+    filename = f"tennis-academy-{selected[0] if format == 'csv' else 'export'}-{date.today().isoformat()}.{format}"
+    media_type = EXPORT_MEDIA_TYPES[format]
+    if gzip:
+        filename, media_type = filename + ".gz", "application/gzip"
+    return StreamingResponse(
+        export.export_stream(engine, format, selected, compress=gzip),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Bundles up to this size are spooled in memory, larger ones to a temporary file
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+@app.post("/api/import")
+async def import_data(request: Request):
+    """Import an NDJSON bundle from /api/export (optionally gzipped) in one transaction.
+
+    Ids are remapped, users with an existing email are matched instead of duplicated,
+    and any bad line rolls back the whole import.
+    """
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as bundle:
+        async for chunk in request.stream():
+            bundle.write(chunk)
+        bundle.seek(0)
         try:
-            qr_parts = request.qr_data.split(":", 1)
-            if len(qr_parts) == 2:
-                user_id = int(qr_parts[0])
-                user_name = qr_parts[1]
-                
-                # Verify user exists
-                user = crud.get_user(db, user_id)
-                if user:
-                    is_registered = True
-                    registration_message = "Registered student"
-        except (ValueError, IndexError):
-            pass
-        
-        # If not a registered user, treat the QR data as a name and create a new user
-        if not user:
-            user_name = request.qr_data
-            # Try to find user by name first
-            user = crud.find_user_by_qr_data(db, user_name)
-            if not user:
-                # Create a new user
-                user = crud.create_user_for_attendance(db, user_name)
-                registration_message = "New student added"
-            else:
-                registration_message = "Student found by name"
-        
-        # Check if already marked present
-        existing_attendance = db.query(models.Attendance).filter(
-            models.Attendance.class_id == request.class_id,
-            models.Attendance.user_id == user.id
-        ).first()
-        
-        if existing_attendance and existing_attendance.status in ["present", "late"]:
-            return schemas.AttendanceScanResponse(
-                success=False,
-                message=f"Already marked {existing_attendance.status}",
-                user_name=user.name,
-                already_present=True,
-                is_registered=is_registered,
-                registration_message=registration_message
-            )
-        
-        # Mark attendance
-        attendance = crud.mark_attendance(db, request.class_id, user.id, request.status)
-        
-        return schemas.AttendanceScanResponse(
-            success=True,
-            message="Attendance marked successfully",
-            user_name=user.name,
-            already_present=False,
-            is_registered=is_registered,
-            registration_message=registration_message
-        )
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"[ERROR] Attendance scan failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Attendance scan failed: {str(e)}")
+            counts = await run_in_threadpool(importer.import_bundle, engine, bundle)
+        except importer.BundleError as e:
+            raise HTTPException(status_code=400, detail=f"Nothing imported, {e}")
+        except (DBAPIError, UnicodeDecodeError, EOFError, OSError) as e:
+            print(f"[ERROR] Import rolled back: {e}")
+            raise HTTPException(status_code=400, detail=f"Nothing imported: {getattr(e, 'orig', e)}")
+    return {"imported": counts}
+
+# Internal endpoints
+@app.get("/metrics")
+def get_metrics():
+    """Request metrics in the Prometheus text format"""
+    return Response(content=metrics.request_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/internal/pool")
+def get_pool_stats():
+    """Connection pool occupancy, checkout counts and wait-time histogram, for sizing the pool"""
+    return get_pool_status()
 
 # Root endpoint
 @app.get("/")
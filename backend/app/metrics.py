@@ -0,0 +1,292 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from functools import lru_cache
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+# Distinct (method, path) pairs whose route label is remembered
+ROUTE_LABEL_CACHE_SIZE = 4096
+
+# Upper bounds in seconds of the request latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Report per-request query counts and likely N+1 patterns in X-Query-* headers and the log
+QUERY_DEBUG = os.getenv("QUERY_DEBUG", "false").lower() in ("1", "true", "yes", "on")
+
+# Runs of the same SQL text within one request at which it is flagged as a likely N+1
+N_PLUS_ONE_THRESHOLD = 3
+
+# Responses of these types stay open for as long as the client listens; they are
+# counted as streams rather than timed as requests
+STREAMING_CONTENT_TYPES = (b"text/event-stream",)
+
+class RequestTimings:
+    """Statements one request executes, and the database time they take"""
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.statements = {}
+
+    def record(self, statement: str, seconds: float):
+        self.db_seconds += seconds
+        self.queries += 1
+        self.statements[statement] = self.statements.get(statement, 0) + 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        """(count, statement) for SQL run at least threshold times, most repeated first"""
+        return sorted(
+            ((count, statement) for statement, count in self.statements.items() if count >= threshold),
+            reverse=True
+        )
+
+# Set by MetricsMiddleware for each request; sync handlers see it through the copied
+# context of the threadpool, so engine events can charge DB time to the request
+current_timings = contextvars.ContextVar("current_timings", default=None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start"].pop()
+    timings = current_timings.get()
+    if timings is not None:
+        timings.record(statement, time.perf_counter() - started)
+
+def instrument_engine(engine):
+    """Count and time every statement run on engine (pass async_engine.sync_engine for async engines)"""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+def _escape(value: str):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(**labels):
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in labels.items()) + "}"
+
+class RequestMetrics:
+    """Per-route request counters, latency histograms and in-flight gauges.
+
+    Streaming responses (Server-Sent Events) leave the in-flight gauge once their
+    headers are sent and are tracked by their own open-streams gauge and counters, so
+    long-lived connections don't skew request latency or concurrency.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.errors = {}
+            self.in_flight = {}
+            self.latency = {}
+            self.db_seconds = {}
+            self.queries = {}
+            self.streams_open = {}
+            self.streams = {}
+            self.stream_seconds = {}
+
+    def started(self, method: str, route: str):
+        with self._lock:
+            self.in_flight[(method, route)] = self.in_flight.get((method, route), 0) + 1
+
+    def streaming(self, method: str, route: str):
+        """Move a request whose response is a stream from in-flight to open streams"""
+        key = (method, route)
+        with self._lock:
+            self.in_flight[key] -= 1
+            self.streams_open[key] = self.streams_open.get(key, 0) + 1
+
+    def stream_finished(self, method: str, route: str, seconds: float):
+        key = (method, route)
+        with self._lock:
+            self.streams_open[key] -= 1
+            self.streams[key] = self.streams.get(key, 0) + 1
+            self.stream_seconds[key] = self.stream_seconds.get(key, 0.0) + seconds
+
+    def finished(self, method: str, route: str, status_code: int, seconds: float, timings: RequestTimings):
+        key = (method, route)
+        with self._lock:
+            self.in_flight[key] -= 1
+            self.requests[(method, route, status_code)] = self.requests.get((method, route, status_code), 0) + 1
+            if status_code >= 500:
+                self.errors[key] = self.errors.get(key, 0) + 1
+            buckets, total, count = self.latency.get(key) or ([0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0)
+            buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            self.latency[key] = (buckets, total + seconds, count + 1)
+            self.db_seconds[key] = self.db_seconds.get(key, 0.0) + timings.db_seconds
+            self.queries[key] = self.queries.get(key, 0) + timings.queries
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            requests = dict(self.requests)
+            errors = dict(self.errors)
+            in_flight = dict(self.in_flight)
+            latency = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.latency.items()}
+            db_seconds = dict(self.db_seconds)
+            queries = dict(self.queries)
+            streams_open = dict(self.streams_open)
+            streams = dict(self.streams)
+            stream_seconds = dict(self.stream_seconds)
+
+        lines = [
+            "# HELP http_requests_total Requests completed, by route, method and status code.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status_code), value in sorted(requests.items()):
+            lines.append(f"http_requests_total{_labels(method=method, route=route, status=status_code)} {value}")
+
+        lines += [
+            "# HELP http_request_errors_total Requests that failed with a 5xx status or an unhandled exception.",
+            "# TYPE http_request_errors_total counter",
+        ]
+        for (method, route), value in sorted(errors.items()):
+            lines.append(f"http_request_errors_total{_labels(method=method, route=route)} {value}")
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for (method, route), value in sorted(in_flight.items()):
+            lines.append(f"http_requests_in_flight{_labels(method=method, route=route)} {value}")
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from request start to the end of the response body.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (method, route), (buckets, total, count) in sorted(latency.items()):
+            cumulative = 0
+            for bound, value in zip(LATENCY_BUCKETS + ("+Inf",), buckets):
+                cumulative += value
+                lines.append(f"http_request_duration_seconds_bucket{_labels(method=method, route=route, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_sum{_labels(method=method, route=route)} {total:.6f}")
+            lines.append(f"http_request_duration_seconds_count{_labels(method=method, route=route)} {count}")
+
+        lines += [
+            "# HELP http_request_db_seconds_total Time spent executing SQL statements, by route.",
+            "# TYPE http_request_db_seconds_total counter",
+        ]
+        for (method, route), value in sorted(db_seconds.items()):
+            lines.append(f"http_request_db_seconds_total{_labels(method=method, route=route)} {value:.6f}")
+
+        lines += [
+            "# HELP http_request_queries_total SQL statements executed, by route.",
+            "# TYPE http_request_queries_total counter",
+        ]
+        for (method, route), value in sorted(queries.items()):
+            lines.append(f"http_request_queries_total{_labels(method=method, route=route)} {value}")
+
+        lines += [
+            "# HELP http_streams_open Streaming responses (e.g. Server-Sent Events) currently connected.",
+            "# TYPE http_streams_open gauge",
+        ]
+        for (method, route), value in sorted(streams_open.items()):
+            lines.append(f"http_streams_open{_labels(method=method, route=route)} {value}")
+
+        lines += [
+            "# HELP http_streams_total Streaming responses closed.",
+            "# TYPE http_streams_total counter",
+        ]
+        for (method, route), value in sorted(streams.items()):
+            lines.append(f"http_streams_total{_labels(method=method, route=route)} {value}")
+
+        lines += [
+            "# HELP http_stream_seconds_total Time closed streaming responses stayed connected.",
+            "# TYPE http_stream_seconds_total counter",
+        ]
+        for (method, route), value in sorted(stream_seconds.items()):
+            lines.append(f"http_stream_seconds_total{_labels(method=method, route=route)} {value:.6f}")
+        return "\n".join(lines) + "\n"
+
+request_metrics = RequestMetrics()
+
+class MetricsMiddleware:
+    """ASGI middleware that records request metrics and adds a Server-Timing header.
+
+    Routes are labelled by their path template (e.g. /api/users/{user_id}) so label
+    cardinality stays bounded; paths that match no route share the "unmatched" label.
+    """
+
+    def __init__(self, app, metrics: RequestMetrics = request_metrics):
+        self.app = app
+        self.metrics = metrics
+        self._router = None
+        self._route_label = lru_cache(maxsize=ROUTE_LABEL_CACHE_SIZE)(self._match_route)
+
+    def _match_route(self, method: str, path: str):
+        """Path template of the route the router will pick, matched the same way it does"""
+        scope = {"type": "http", "method": method, "path": path, "root_path": ""}
+        partial = "unmatched"
+        for route in self._router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return route.path
+            if match == Match.PARTIAL and partial == "unmatched":
+                partial = route.path
+        return partial
+
+    @staticmethod
+    def _debug_headers(method: str, route: str, timings: RequestTimings):
+        headers = [
+            (b"x-query-count", str(timings.queries).encode()),
+            (b"x-query-time-ms", f"{timings.db_seconds * 1000:.1f}".encode()),
+        ]
+        repeated = timings.repeated()
+        if repeated:
+            count, statement = repeated[0]
+            summary = " ".join(statement.split())[:200]
+            headers.append((b"x-query-repeats", f"{count}x {summary}".encode("ascii", "replace")))
+            for count, statement in repeated:
+                print(f"[WARN] Possible N+1 in {method} {route}: {count}x {' '.join(statement.split())[:200]}")
+        return headers
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        self._router = scope["app"].router
+        route = self._route_label(method, scope["path"])
+        started = time.perf_counter()
+        timings = RequestTimings()
+        token = current_timings.set(timings)
+        status_code = 500
+        streaming = False
+        self.metrics.started(method, route)
+
+        async def send_with_timing(message):
+            nonlocal status_code, streaming
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                content_type = dict(message.get("headers", [])).get(b"content-type", b"")
+                if content_type.startswith(STREAMING_CONTENT_TYPES):
+                    streaming = True
+                    self.metrics.streaming(method, route)
+                total_ms = (time.perf_counter() - started) * 1000
+                db_ms = timings.db_seconds * 1000
+                server_timing = (
+                    f'db;dur={db_ms:.1f};desc="{timings.queries} queries", '
+                    f"app;dur={max(total_ms - db_ms, 0):.1f}, total;dur={total_ms:.1f}"
+                )
+                headers = [*message.get("headers", []), (b"server-timing", server_timing.encode())]
+                if QUERY_DEBUG:
+                    headers += self._debug_headers(method, route, timings)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_timings.reset(token)
+            if streaming:
+                self.metrics.stream_finished(method, route, time.perf_counter() - started)
+            else:
+                self.metrics.finished(method, route, status_code, time.perf_counter() - started, timings)
@@ -1,13 +1,22 @@
-from sqlalchemy import Column, Integer, String, Float, Date, Boolean, ForeignKey, DateTime, Time
+from sqlalchemy import Column, Integer, String, Float, Date, Boolean, ForeignKey, DateTime, Time, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
 
+def normalize_name(name: str):
+    """Case- and whitespace-insensitive form of a name, used to match typed names to users"""
+    return " ".join(name.split()).casefold()
+
+def _normalized_name_default(context):
+    return normalize_name(context.get_current_parameters()["name"])
+
 class User(Base):
     __tablename__ = "users"
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
+    # Filled from name on insert, including Core multi-row inserts; users are never renamed
+    normalized_name = Column(String, index=True, default=_normalized_name_default)
     email = Column(String, unique=True, nullable=False, index=True)
     role = Column(String, nullable=False)  # student, parent, coach
     
@@ -29,6 +38,10 @@ class Package(Base):
 
 class Class(Base):
     __tablename__ = "classes"
+    __table_args__ = (
+        # Serves per-package listings filtered and keyset-paginated by date
+        Index("ix_classes_package_date", "package_id", "date"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     package_id = Column(Integer, ForeignKey("packages.id"), nullable=False)
@@ -44,13 +57,53 @@ class Class(Base):
 
 class Attendance(Base):
     __tablename__ = "attendance"
+    __table_args__ = (
+        # One row per student per class; the attendance upsert conflicts on this index
+        Index("ix_attendance_class_user", "class_id", "user_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(String, default="present")  # present, late, missing
+    # Status before the latest upsert (None when inserted), so the aggregates can apply deltas
+    previous_status = Column(String)
     checked_in_at = Column(DateTime, default=func.now())
     
     # Relationships
     class_record = relationship("Class", back_populates="attendance_records")
-    user = relationship("User", back_populates="attendance_records") 
\ No newline at end of file
+    user = relationship("User", back_populates="attendance_records") 
+
+class ScanReceipt(Base):
+    """Idempotency keys of offline scans that have already been synced"""
+    __tablename__ = "scan_receipts"
+    
+    idempotency_key = Column(String, primary_key=True)
+    class_id = Column(Integer, ForeignKey("classes.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    result = Column(String, nullable=False)  # applied, already_present
+    received_at = Column(DateTime, default=func.now())
+
+
+class ClassAttendanceStats(Base):
+    """Attendance counts per class, kept current by every attendance write (crud.apply_attendance_deltas)"""
+    __tablename__ = "class_attendance_stats"
+    
+    class_id = Column(Integer, ForeignKey("classes.id"), primary_key=True)
+    present = Column(Integer, nullable=False, default=0)
+    late = Column(Integer, nullable=False, default=0)
+    missing = Column(Integer, nullable=False, default=0)  # Marked missing; unmarked students aren't counted
+
+class UserPackageAttendance(Base):
+    """Attendance counts per student per package, kept current alongside ClassAttendanceStats"""
+    __tablename__ = "user_package_attendance"
+    __table_args__ = (
+        # Serves per-package reports; the primary key serves per-student ones
+        Index("ix_user_package_attendance_package", "package_id"),
+    )
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    package_id = Column(Integer, ForeignKey("packages.id"), primary_key=True)
+    attended = Column(Integer, nullable=False, default=0)  # present or late
+    late = Column(Integer, nullable=False, default=0)
+    missing = Column(Integer, nullable=False, default=0)
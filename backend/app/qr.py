@@ -0,0 +1,114 @@
+import base64
+import hashlib
+import hmac
+import io
+import os
+import re
+from functools import lru_cache
+
+import qrcode
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of rendered PNGs kept in memory (a version 1 code is well under 1 KB)
+QR_CACHE_SIZE = int(os.getenv("QR_CACHE_SIZE", "2048"))
+
+# Rendering parameters; part of the ETag so a change invalidates client caches
+QR_RENDER_OPTIONS = {
+    "version": 1,
+    "error_correction": qrcode.constants.ERROR_CORRECT_H,
+    "box_size": 10,
+    "border": 4,
+}
+
+def _signing_keys(value: str):
+    """Parse "version:secret" pairs separated by commas"""
+    keys = {}
+    for item in value.split(","):
+        version, _, secret = item.strip().partition(":")
+        if not secret:
+            raise ValueError(f"QR_SIGNING_KEYS entry {item.strip()!r} has no secret")
+        keys[int(version)] = secret.encode()
+    return keys
+
+def _configured_keys():
+    if os.getenv("QR_SIGNING_KEYS"):
+        return _signing_keys(os.getenv("QR_SIGNING_KEYS"))
+    if os.getenv("SECRET_KEY"):
+        return {1: os.getenv("SECRET_KEY").encode()}
+    # No default key: one in the source would let anyone forge badges
+    return {}
+
+# Badge signing keys by version. Badges are signed with QR_KEY_VERSION; dropping a
+# version from QR_SIGNING_KEYS retires every badge printed with it. Without any key,
+# badges carry the unsigned "id:name" payload and signed tokens are rejected.
+QR_SIGNING_KEYS = _configured_keys()
+QR_KEY_VERSION = int(os.getenv("QR_KEY_VERSION", str(max(QR_SIGNING_KEYS, default=1))))
+
+# Accept unsigned "id:name" badges printed before tokens, until they are reprinted;
+# always on without a signing key, since those are the only badges printed then
+QR_ACCEPT_LEGACY = os.getenv("QR_ACCEPT_LEGACY", "true").lower() in ("1", "true", "yes", "on") or not QR_SIGNING_KEYS
+
+# Tokens use only QR alphanumeric characters (upper case, digits, "."), the densest
+# text mode, so badges stay small: QA<version>.<user id>.<80-bit base32 signature>
+QR_TOKEN_PATTERN = re.compile(r"QA(\d+)\.(\d+)\.([A-Z2-7]{16})")
+
+class InvalidQRToken(ValueError):
+    pass
+
+def _token_signature(version: int, user_id: int):
+    digest = hmac.new(QR_SIGNING_KEYS[version], f"QA{version}.{user_id}".encode(), hashlib.sha256).digest()
+    return base64.b32encode(digest[:10]).decode()
+
+def sign_user_token(user_id: int, version: int = QR_KEY_VERSION):
+    if version not in QR_SIGNING_KEYS:
+        raise InvalidQRToken(f"No QR signing key for version {version}; set QR_SIGNING_KEYS or SECRET_KEY")
+    return f"QA{version}.{user_id}.{_token_signature(version, user_id)}"
+
+def parse_user_qr(qr_data: str):
+    """Return (user_id, signed) for a badge payload, or (None, False) for a typed name.
+
+    Signed tokens are verified without touching the database; a forged token or one
+    signed with a retired key raises InvalidQRToken.
+    """
+    match = QR_TOKEN_PATTERN.fullmatch(qr_data)
+    if match:
+        if not QR_SIGNING_KEYS:
+            raise InvalidQRToken("Signed badges are not enabled on this server.")
+        version, user_id, signature = int(match[1]), int(match[2]), match[3]
+        if version not in QR_SIGNING_KEYS:
+            raise InvalidQRToken("This badge has been retired. Please print a new one.")
+        if not hmac.compare_digest(signature, _token_signature(version, user_id)):
+            raise InvalidQRToken("This badge is not valid.")
+        return user_id, True
+    
+    qr_parts = qr_data.split(":", 1)
+    if len(qr_parts) == 2 and qr_parts[0].isdigit():
+        if not QR_ACCEPT_LEGACY:
+            raise InvalidQRToken("This badge has been retired. Please print a new one.")
+        return int(qr_parts[0]), False
+    return None, False
+
+def user_qr_data(user):
+    """QR payload encoded on a user's badge"""
+    if not QR_SIGNING_KEYS:
+        return f"{user.id}:{user.name}"
+    return sign_user_token(user.id)
+
+def qr_etag(payload: str):
+    """Strong ETag for the PNG of a payload, computed without rendering it"""
+    digest = hashlib.sha256(f"{payload}|{sorted(QR_RENDER_OPTIONS.items())}".encode()).hexdigest()
+    return f'"{digest[:32]}"'
+
+@lru_cache(maxsize=QR_CACHE_SIZE)
+def render_qr_png(payload: str):
+    """Render a QR code as PNG bytes; repeated payloads are served from the LRU cache"""
+    qr = qrcode.QRCode(**QR_RENDER_OPTIONS)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
@@ -0,0 +1,54 @@
+"""Query budgets: assert that an endpoint runs no more SQL statements than declared.
+
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.query_budget import assert_query_budget
+
+    with TestClient(app) as client:
+        # A signed badge: the check-in upsert and the two aggregate deltas
+        assert_query_budget(client, "POST", "/api/attendance/scan", 3, json={...})
+
+tests/test_query_budget.py pins the budgets of the hot attendance endpoints.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from .database import engine as default_engine
+from .metrics import N_PLUS_ONE_THRESHOLD, RequestTimings
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def count_queries(engine=default_engine):
+    """Collect every statement run on engine inside the block, from any thread"""
+    timings = RequestTimings()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        timings.record(statement, 0.0)
+
+    event.listen(engine, "after_cursor_execute", record)
+    try:
+        yield timings
+    finally:
+        event.remove(engine, "after_cursor_execute", record)
+
+def assert_query_budget(client, method: str, url: str, budget: int, engine=default_engine, allow_repeats: bool = False, **kwargs):
+    """Send one request with client and fail if it runs more than budget statements.
+
+    Statements repeated N_PLUS_ONE_THRESHOLD times or more also fail, as a likely N+1,
+    unless allow_repeats is set. Returns the response for further assertions.
+    """
+    with count_queries(engine) as timings:
+        response = client.request(method, url, **kwargs)
+
+    problems = []
+    if timings.queries > budget:
+        problems.append(f"ran {timings.queries} queries, budget is {budget}")
+    if not allow_repeats:
+        problems.extend(f"repeated {count}x (N+1?): {statement}" for count, statement in timings.repeated(N_PLUS_ONE_THRESHOLD))
+    if problems:
+        executed = "\n".join(f"  {count}x {statement}" for statement, count in timings.statements.items())
+        raise QueryBudgetExceeded(f"{method} {url} " + "; ".join(problems) + f"\nStatements:\n{executed}")
+    return response
@@ -0,0 +1,70 @@
+"""Reading student rosters from spreadsheet CSV exports.
+
+The header row names the columns, in any order and case: name (or first_name and
+last_name), email and role. Rows come out normalized, ready for crud.enroll_users.
+"""
+import csv
+import re
+
+ROLES = ("student", "parent", "coach")
+
+EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+# Header spellings accepted for each column
+HEADER_ALIASES = {
+    "name": ("name", "full name", "full_name", "student", "student name"),
+    "first_name": ("first name", "first_name", "firstname", "given name"),
+    "last_name": ("last name", "last_name", "lastname", "surname", "family name"),
+    "email": ("email", "e-mail", "email address"),
+    "role": ("role",),
+}
+
+class RosterError(ValueError):
+    pass
+
+def _columns(header: list):
+    """Map each known column to its index in the header row"""
+    found = {}
+    for index, title in enumerate(header):
+        title = " ".join(title.split()).lower()
+        for column, aliases in HEADER_ALIASES.items():
+            if title in aliases and column not in found:
+                found[column] = index
+    if "name" not in found and "first_name" not in found:
+        raise RosterError("The header row needs a name column, or first_name and last_name")
+    return found
+
+def read_roster(lines):
+    """Dicts of line, name, email, role and error for each non-blank row.
+
+    Names have their whitespace collapsed and emails are lowercased; a row that cannot
+    be enrolled has error set.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if header is None:
+        raise RosterError("The file is empty")
+    columns = _columns(header)
+
+    def cell(row, column):
+        index = columns.get(column)
+        return row[index].strip() if index is not None and index < len(row) else ""
+
+    for row in reader:
+        if not any(value.strip() for value in row):
+            continue
+        name = cell(row, "name") or f"{cell(row, 'first_name')} {cell(row, 'last_name')}"
+        entry = {
+            "line": reader.line_num,
+            "name": " ".join(name.split()),
+            "email": cell(row, "email").lower() or None,
+            "role": cell(row, "role").lower() or "student",
+            "error": None,
+        }
+        if not entry["name"]:
+            entry["error"] = "Missing name"
+        elif entry["email"] and not EMAIL_PATTERN.match(entry["email"]):
+            entry["error"] = f"Invalid email {entry['email']!r}"
+        elif entry["role"] not in ROLES:
+            entry["error"] = f"Invalid role {entry['role']!r}. Must be one of: {', '.join(ROLES)}"
+        yield entry
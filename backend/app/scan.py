@@ -0,0 +1,105 @@
+"""The badge scan flow, shared by the sync and async scan endpoints.
+
+scan_steps is written once as a generator: each data access is yielded as
+(function name, args) and the result is sent back in. scan_attendance runs those
+against crud and scan_attendance_async against crud_async, whose functions share
+names and signatures, so there is a single copy of the flow to maintain.
+"""
+from fastapi import HTTPException
+
+from . import crud, crud_async, qr, schemas
+
+def scan_steps(request: schemas.AttendanceScanRequest):
+    """Token parse, identity lookup, name fallback or walk-in create, then check-in"""
+    is_registered = False
+    registration_message = None
+
+    # Badges carry a signed token; a valid signature proves the badge was issued here
+    try:
+        user_id, signed = qr.parse_user_qr(request.qr_data)
+    except qr.InvalidQRToken as e:
+        return schemas.AttendanceScanResponse(success=False, message=str(e))
+
+    if signed:
+        # The signature proves the badge was issued here, so the check-in is written
+        # straight away; the upsert itself skips users deleted since
+        is_registered = True
+        registration_message = "Registered student"
+    elif user_id is not None:
+        # Legacy "user_id:user_name" badges: fall back to the name if the id is unknown
+        user = yield "get_user_identity", (user_id,)
+        if user:
+            is_registered = True
+            registration_message = "Registered student"
+        else:
+            user_id = None
+
+    # If not a registered user, treat the QR data as a name and create a new user
+    if user_id is None:
+        user_name = request.qr_data
+        # Try to find user by name first
+        user = yield "find_user_by_qr_data", (user_name,)
+        if not user:
+            # Create a new user
+            user = yield "create_user_for_attendance", (user_name,)
+            registration_message = "New student added"
+        else:
+            registration_message = "Student found by name"
+        user_id = user.id
+
+    # Mark attendance in one upsert; rows already present or late are left untouched
+    attendance = yield "check_in_attendance", (request.class_id, user_id, request.status)
+
+    if not attendance:
+        existing_attendance = yield "check_in_state", (request.class_id, user_id)
+        if not existing_attendance:
+            return schemas.AttendanceScanResponse(success=False, message="Unknown student")
+        return schemas.AttendanceScanResponse(
+            success=False,
+            message=f"Already marked {existing_attendance.status}",
+            user_name=existing_attendance.user_name,
+            already_present=True,
+            is_registered=is_registered,
+            registration_message=registration_message
+        )
+
+    return schemas.AttendanceScanResponse(
+        success=True,
+        message="Attendance marked successfully",
+        user_name=attendance.user_name,
+        already_present=False,
+        is_registered=is_registered,
+        registration_message=registration_message
+    )
+
+def _scan_failed(e: Exception):
+    print(f"[ERROR] Attendance scan failed: {str(e)}")
+    return HTTPException(status_code=500, detail=f"Attendance scan failed: {str(e)}")
+
+def scan_attendance(db, request: schemas.AttendanceScanRequest):
+    steps = scan_steps(request)
+    try:
+        result = None
+        while True:
+            name, args = steps.send(result)
+            result = getattr(crud, name)(db, *args)
+    except StopIteration as done:
+        return done.value
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _scan_failed(e)
+
+async def scan_attendance_async(db, request: schemas.AttendanceScanRequest):
+    steps = scan_steps(request)
+    try:
+        result = None
+        while True:
+            name, args = steps.send(result)
+            result = await getattr(crud_async, name)(db, *args)
+    except StopIteration as done:
+        return done.value
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise _scan_failed(e)
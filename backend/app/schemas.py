@@ -48,10 +48,60 @@ class ClassCreate(ClassBase):
 
 class Class(ClassBase):
     id: int
-    
+
+    class Config:
+        from_attributes = True
+
+# Schedule schemas
+class ScheduleSlot(BaseModel):
+    weekdays: List[str]  # Monday ... Sunday
+    start_time: time
+    end_time: time
+    location: str
+
+class ScheduleGenerateRequest(BaseModel):
+    slots: List[ScheduleSlot]
+    start_date: Optional[date] = None  # Defaults to the package's start_date
+    end_date: Optional[date] = None  # Defaults to the package's end_date
+    skip_dates: List[date] = []  # Holidays and other days without classes
+    preview: bool = False
+
+class ScheduledClass(ClassBase):
+    id: Optional[int] = None  # None in a preview
+
     class Config:
         from_attributes = True
 
+class ScheduleGenerateResponse(BaseModel):
+    preview: bool
+    created: int
+    skipped_existing: int
+    classes: List[ScheduledClass]
+
+class ClassSelection(BaseModel):
+    package_id: Optional[int] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    location: Optional[str] = None
+    weekdays: Optional[List[str]] = None
+    preview: bool = False
+
+class ClassShiftRequest(ClassSelection):
+    days: int
+
+class ClassRescheduleRequest(ClassSelection):
+    new_start_time: Optional[time] = None
+    new_end_time: Optional[time] = None
+    new_location: Optional[str] = None
+
+class ClassCancelRequest(ClassSelection):
+    cancelled: bool = True  # False restores cancelled classes
+
+class ClassBulkResponse(BaseModel):
+    preview: bool
+    matched: int
+    classes: List[Class]  # As they are in a preview, as updated otherwise
+
 # Attendance schemas
 class AttendanceBase(BaseModel):
     class_id: int
@@ -68,6 +118,77 @@ class Attendance(AttendanceBase):
     class Config:
         from_attributes = True
 
+class AttendanceBulkEntry(BaseModel):
+    user_id: int
+    status: str = "present"  # present, late, missing
+
+class AttendanceBulkMarkRequest(BaseModel):
+    class_id: int
+    entries: List[AttendanceBulkEntry]
+
+class AttendanceCounts(BaseModel):
+    present: int = 0
+    late: int = 0
+    missing: int = 0
+
+class AttendanceBulkMarkResponse(BaseModel):
+    results: List[Attendance]
+    counts: AttendanceCounts
+
+# Attendance report schemas
+class ClassAttendanceSummary(BaseModel):
+    id: int
+    package_id: int
+    package_name: str
+    date: date
+    start_time: time
+    end_time: time
+    location: str
+    cancelled: Optional[bool] = False
+    present: int
+    late: int
+    missing: int  # Marked missing; students never marked aren't counted
+    headcount: int  # present + late
+
+class StudentAttendanceSummary(BaseModel):
+    user_id: int
+    name: str
+    email: str
+    attended: int  # present or late
+    late: int
+    missing: int
+    attendance_rate: Optional[float] = None  # attended / classes held
+
+class PackageAttendanceReport(BaseModel):
+    package_id: int
+    as_of: date
+    classes_held: int  # Not cancelled, up to as_of
+    students: List[StudentAttendanceSummary]
+
+class UserPackageSummary(BaseModel):
+    package_id: int
+    package_name: str
+    attended: int
+    late: int
+    missing: int
+
+# Roster enrollment schemas
+class RosterEntryResult(BaseModel):
+    line: int
+    name: str
+    email: Optional[str] = None
+    result: str  # created, matched, conflict, invalid
+    user_id: Optional[int] = None
+    detail: Optional[str] = None
+
+class RosterImportResponse(BaseModel):
+    dry_run: bool
+    created: int
+    matched: int
+    conflicts: int
+    invalid: int
+    results: List[RosterEntryResult]
+
 # QR Code schemas
 class QRGenerateRequest(BaseModel):
     name: str
@@ -90,6 +211,31 @@ class AttendanceScanResponse(BaseModel):
     is_registered: bool = False
     registration_message: Optional[str] = None
 
+# Offline scan sync schemas
+class QueuedScan(BaseModel):
+    idempotency_key: str
+    qr_data: str
+    class_id: int
+    status: str = "present"
+    scanned_at: datetime  # Device time of the scan, kept as checked_in_at
+
+class ScanSyncRequest(BaseModel):
+    scans: List[QueuedScan]
+
+class ScanSyncResult(BaseModel):
+    idempotency_key: str
+    result: str  # applied, already_present, duplicate, rejected
+    user_id: Optional[int] = None
+    class_id: int
+    user_name: Optional[str] = None
+
+class ScanSyncResponse(BaseModel):
+    results: List[ScanSyncResult]
+    applied: int
+    already_present: int
+    duplicates: int
+    rejected: int = 0
+
 # Coach authentication
 class CoachAuthRequest(BaseModel):
     password: str
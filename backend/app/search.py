@@ -0,0 +1,102 @@
+import heapq
+import os
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import models
+
+# Seconds between checks for users created by other worker processes
+SEARCH_INDEX_REFRESH = float(os.getenv("SEARCH_INDEX_REFRESH", "30"))
+
+# Matches sharing less than this fraction of trigrams with the query are dropped
+SEARCH_MIN_SIMILARITY = 0.2
+
+def trigrams(text: str):
+    """Trigrams of a normalized name, padded so word starts form their own grams"""
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class UserSearchIndex:
+    """In-memory trigram index over student names for typeahead search.
+
+    Loaded from the database on first use, then kept current by add() as users are
+    created. Users created by other processes are picked up every SEARCH_INDEX_REFRESH
+    seconds with a query on ids above the last one synced.
+    """
+
+    def __init__(self):
+        self._users = {}
+        self._postings = {}
+        self._synced_id = 0
+        self._synced_at = None
+        self._lock = threading.Lock()
+
+    def add(self, user_id: int, name: str, email: str, role: str):
+        """Index a user if they are a student; coaches and parents aren't suggested"""
+        if role != "student":
+            return
+        normalized = models.normalize_name(name)
+        grams = trigrams(normalized)
+        with self._lock:
+            if user_id in self._users:
+                return
+            self._users[user_id] = (name, email, normalized, len(grams))
+            for gram in grams:
+                self._postings.setdefault(gram, set()).add(user_id)
+
+    def update_email(self, user_id: int, email: str):
+        """Show a user's new email; other processes keep the old one until they restart"""
+        with self._lock:
+            if user_id in self._users:
+                name, _, normalized, size = self._users[user_id]
+                self._users[user_id] = (name, email, normalized, size)
+
+    def sync(self, db: Session):
+        """Index users the database has beyond those already synced"""
+        rows = db.execute(
+            select(models.User.id, models.User.name, models.User.email, models.User.role)
+            .where(models.User.id > self._synced_id)
+            .order_by(models.User.id)
+        ).all()
+        for row in rows:
+            self.add(row.id, row.name, row.email, row.role)
+        with self._lock:
+            if rows:
+                self._synced_id = max(self._synced_id, rows[-1].id)
+            self._synced_at = time.monotonic()
+
+    def search(self, db: Session, q: str, limit: int = 10):
+        """Users ranked by trigram similarity to q, with prefix matches first"""
+        if self._synced_at is None or time.monotonic() - self._synced_at > SEARCH_INDEX_REFRESH:
+            self.sync(db)
+
+        query = models.normalize_name(q)
+        grams = trigrams(query)
+        if not grams:
+            return []
+        with self._lock:
+            shared = Counter()
+            for gram in grams:
+                shared.update(self._postings.get(gram, ()))
+            candidates = [(user_id, count, self._users[user_id]) for user_id, count in shared.items()]
+
+        matches = []
+        for user_id, count, (name, email, normalized, size) in candidates:
+            # Jaccard similarity of the two trigram sets
+            similarity = count / (len(grams) + size - count)
+            prefix = f" {query}" in f" {normalized}"
+            if prefix or similarity >= SEARCH_MIN_SIMILARITY:
+                matches.append((not prefix, -similarity, name, user_id, email))
+        return [
+            {"id": user_id, "name": name, "email": email, "score": round(-negative, 3)}
+            for _, negative, name, user_id, email in heapq.nsmallest(limit, matches)
+        ]
+
+user_search_index = UserSearchIndex()
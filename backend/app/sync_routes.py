@@ -0,0 +1,46 @@
+"""Sync versions of the hot attendance endpoints, served unless DB_MODE=async.
+
+async_routes holds the async versions of the same paths; main includes exactly one
+of the two routers, so every path has a single handler.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from typing import Optional
+
+from . import crud, scan, schemas
+from .database import get_db
+
+router = APIRouter()
+
+@router.post("/api/attendance/mark")
+def mark_attendance(request: dict, db: Session = Depends(get_db)):
+    class_id = request.get("class_id")
+    user_id = request.get("user_id")
+    status = request.get("status", "present")
+    
+    if not class_id or not user_id:
+        raise HTTPException(status_code=400, detail="class_id and user_id are required")
+    
+    if status not in ["present", "late", "missing"]:
+        raise HTTPException(status_code=400, detail="Invalid status. Must be 'present', 'late', or 'missing'")
+    
+    return crud.mark_attendance(db, class_id, user_id, status)
+
+@router.get("/api/attendance/comprehensive/{class_id}")
+def get_comprehensive_attendance(
+    class_id: int,
+    sort: str = "id",
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """Get comprehensive attendance data for a class"""
+    if sort not in crud.ROSTER_SORTS:
+        raise HTTPException(status_code=400, detail=f"Invalid sort. Must be one of: {', '.join(crud.ROSTER_SORTS)}")
+    attendance_data = crud.get_comprehensive_attendance_for_class(db, class_id, sort=sort, limit=limit, offset=offset)
+    return attendance_data
+
+@router.post("/api/attendance/scan", response_model=schemas.AttendanceScanResponse)
+def scan_attendance(request: schemas.AttendanceScanRequest, db: Session = Depends(get_db)):
+    """Scan QR code and mark attendance"""
+    return scan.scan_attendance(db, request)
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - Endpoint Benchmark
+Build a synthetic academy with bulk inserts, then drive every route in app/main.py
+in-process through an ASGI test client and report latency, throughput and memory
+
+Usage: python benchmark_endpoints.py [--database-url URL ...] [--scale 1.0] [--requests 200]
+                                     [--output results.json] [--compare previous.json]
+
+Each database URL is benchmarked in its own process, since app.database binds its engine
+at import. The default is a fresh SQLite file; pass e.g. postgresql://localhost/tennis_bench
+for a local Postgres. Use scratch databases: the benchmark seeds empty ones and writes to them.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, time as dt_time
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# Dataset size at --scale 1.0
+USERS = 20000
+PACKAGES = 500
+CLASSES = 20000
+ATTENDANCE = 2000000
+
+# Rows per bulk insert statement
+SEED_CHUNK_SIZE = 5000
+
+FIRST_NAMES = ["Ava", "Ben", "Carlos", "Diana", "Ethan", "Fatima", "George", "Hana", "Ivan", "Julia",
+               "Kenji", "Liam", "Maria", "Noah", "Olivia", "Priya", "Quinn", "Rosa", "Sam", "Tara"]
+LAST_NAMES = ["Lee", "Smith", "Garcia", "Nguyen", "Patel", "Kim", "Brown", "Lopez", "Khan", "Rossi",
+              "Cohen", "Silva", "Muller", "Okafor", "Sato", "Novak"]
+
+def redact(url):
+    """Database URL without its password"""
+    scheme, _, rest = url.partition("://")
+    credentials, at, host = rest.rpartition("@")
+    if at and ":" in credentials:
+        credentials = credentials.split(":", 1)[0] + ":***"
+    return f"{scheme}://{credentials}{at}{host}"
+
+def bulk_insert(connection, table, rows):
+    """Insert rows in chunks: executemany on SQLite, multi-row VALUES elsewhere"""
+    from sqlalchemy import insert
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == SEED_CHUNK_SIZE:
+            _insert_chunk(connection, insert(table), chunk)
+            chunk = []
+    if chunk:
+        _insert_chunk(connection, insert(table), chunk)
+
+def _insert_chunk(connection, statement, chunk):
+    if connection.dialect.name == "sqlite":
+        connection.execute(statement, chunk)
+    else:
+        # Drivers like pg8000 run executemany row by row; one VALUES list per 1000 rows is far faster
+        for start in range(0, len(chunk), 1000):
+            connection.execute(statement.values(chunk[start:start + 1000]))
+
+def seed(engine, scale):
+    """Create the synthetic academy unless the database already has users; returns row counts"""
+    from sqlalchemy import func, select
+    from app import models
+
+    users = max(int(USERS * scale), 100)
+    packages = max(int(PACKAGES * scale), 2)
+    classes = max(int(CLASSES * scale), packages)
+    attendance = int(ATTENDANCE * scale)
+    per_class = min(max(attendance // classes, 1), users)
+
+    models.Base.metadata.create_all(bind=engine)
+    with engine.connect() as connection:
+        if connection.execute(select(func.count()).select_from(models.User)).scalar():
+            print("Database already has users; skipping seed")
+            return None
+
+    random.seed(2025)
+    with engine.begin() as connection:
+        bulk_insert(connection, models.User.__table__, (
+            {
+                "name": f"{random.choice(FIRST_NAMES)} {random.choice(LAST_NAMES)} {i}",
+                "email": f"student{i}@example.com",
+                "role": "student"
+            }
+            for i in range(users)
+        ))
+        first_day = date(2025, 1, 6)
+        bulk_insert(connection, models.Package.__table__, (
+            {
+                "name": f"Package {i}",
+                "description": "Synthetic benchmark package",
+                "price": 100 + i % 10 * 50,
+                "start_date": first_day + timedelta(days=i % 300),
+                "end_date": first_day + timedelta(days=i % 300 + 60)
+            }
+            for i in range(packages)
+        ))
+        package_ids = connection.execute(select(models.Package.id).order_by(models.Package.id)).scalars().all()
+        bulk_insert(connection, models.Class.__table__, (
+            {
+                "package_id": package_ids[i % packages],
+                "date": first_day + timedelta(days=i % 300 + i // packages % 60),
+                "start_time": dt_time(16),
+                "end_time": dt_time(17),
+                "location": f"Court {i % 6 + 1}",
+                "cancelled": i % 20 == 0
+            }
+            for i in range(classes)
+        ))
+        user_ids = connection.execute(select(models.User.id).order_by(models.User.id)).scalars().all()
+        class_rows = connection.execute(select(models.Class.id, models.Class.date).order_by(models.Class.id)).all()
+
+        def attendance_rows():
+            for class_id, class_date in class_rows:
+                checked_in = datetime.combine(class_date, dt_time(16))
+                for user_id in random.sample(user_ids, per_class):
+                    yield {
+                        "class_id": class_id,
+                        "user_id": user_id,
+                        "status": random.choices(["present", "late", "missing"], weights=[80, 12, 8])[0],
+                        "checked_in_at": checked_in + timedelta(seconds=random.randrange(900))
+                    }
+        bulk_insert(connection, models.Attendance.__table__, attendance_rows())
+
+    # The bulk inserts bypass crud, so the attendance aggregates are built in one pass
+    from sqlalchemy.orm import Session
+    from app import crud
+    with Session(engine) as db:
+        crud.rebuild_attendance_stats(db)
+
+    return {"users": users, "packages": packages, "classes": classes, "attendance": per_class * classes}
+
+def import_bundle(batch: int, students: int = 50, classes: int = 10):
+    """A small NDJSON bundle: one package, its classes and new students marked in every class"""
+    from app import export
+
+    lines = [{"format": export.EXPORT_FORMAT, "version": export.EXPORT_VERSION}]
+    lines.append({"table": "packages", "row": {"id": 1, "name": f"Imported {batch}", "description": None,
+                                                "price": 200, "start_date": "2025-09-01", "end_date": "2025-10-31"}})
+    lines.extend({"table": "users", "row": {"id": i, "name": f"Imported Student {batch}-{i}",
+                                            "email": f"import{batch}-{i}@example.com", "role": "student"}}
+                 for i in range(students))
+    lines.extend({"table": "classes", "row": {"id": i, "package_id": 1, "date": (date(2025, 9, 1) + timedelta(days=7 * i)).isoformat(),
+                                              "start_time": "16:00:00", "end_time": "17:00:00", "location": "Court 1", "cancelled": False}}
+                 for i in range(classes))
+    lines.extend({"table": "attendance", "row": {"id": c * students + u, "class_id": c, "user_id": u, "status": "present",
+                                                 "checked_in_at": f"{date(2025, 9, 1) + timedelta(days=7 * c)}T16:05:00"}}
+                 for c in range(classes) for u in range(students))
+    return "".join(json.dumps(line) + "\n" for line in lines).encode()
+
+def roster_csv(batch: int, user, rows: int = 50):
+    """A roster CSV where half the rows are existing students and half are new"""
+    lines = ["Name,Email,Role"]
+    for i in range(rows):
+        if i % 2:
+            existing = user() - 1
+            lines.append(f"Existing {existing},student{existing}@example.com,student")
+        else:
+            lines.append(f"Roster Student {batch}-{i},roster{batch}-{i}@example.com,student")
+    return ("roster.csv", "\n".join(lines) + "\n", "text/csv")
+
+def scenarios(ids, qr):
+    """(name, method, path, request kwargs, requests) per route; path and kwargs are callables"""
+    user = lambda: random.randint(*ids["users"])
+    package = lambda: random.randint(*ids["packages"])
+    klass = lambda: random.randint(*ids["classes"])
+    counter = iter(range(10 ** 9))
+    walk_in = lambda: f"Walk In {next(counter)}"
+    none = lambda: {}
+    slots = [{"weekdays": ["Tuesday", "Saturday"], "start_time": "09:00", "end_time": "10:00", "location": "Court 2"}]
+
+    return [
+        ("root", "GET", lambda: "/", none, None),
+        ("coach_auth", "POST", lambda: "/api/coach/auth", lambda: {"json": {"password": "wrong"}}, None),
+        ("list_users_page", "GET", lambda: "/api/users", lambda: {"params": {"limit": 100}}, None),
+        ("list_users_all", "GET", lambda: "/api/users", none, 10),
+        ("search_users", "GET", lambda: "/api/users/search", lambda: {"params": {"q": random.choice(FIRST_NAMES)[:3]}}, None),
+        ("get_user", "GET", lambda: f"/api/users/{user()}", none, None),
+        ("user_qr_png", "GET", lambda: f"/api/users/{user()}/qr.png", none, None),
+        ("create_user", "POST", lambda: "/api/users", lambda: {"json": {"name": walk_in(), "email": f"bench{next(counter)}@example.com"}}, None),
+        ("list_packages", "GET", lambda: "/api/packages", none, None),
+        ("get_package", "GET", lambda: f"/api/packages/{package()}", none, None),
+        ("package_classes", "GET", lambda: f"/api/packages/{package()}/classes", none, None),
+        ("create_package", "POST", lambda: "/api/packages", lambda: {"params": {
+            "name": "Bench", "description": "", "price": 1, "start_date": "2025-01-01", "end_date": "2025-03-01"}}, None),
+        ("schedule_preview", "POST", lambda: f"/api/packages/{package()}/schedule", lambda: {"json": {
+            "slots": slots, "preview": True}}, None),
+        ("schedule_generate", "POST", lambda: f"/api/packages/{package()}/schedule", lambda: {"json": {"slots": slots}}, 20),
+        ("classes_bulk_shift", "POST", lambda: "/api/classes/bulk/shift", lambda: {"json": {
+            "package_id": package(), "days": random.choice([-7, 7])}}, 20),
+        ("classes_bulk_reschedule", "POST", lambda: "/api/classes/bulk/reschedule", lambda: {"json": {
+            "package_id": package(), "weekdays": ["Monday", "Wednesday"], "new_location": f"Court {random.randint(1, 6)}"}}, 20),
+        ("classes_bulk_cancel", "POST", lambda: "/api/classes/bulk/cancel", lambda: {"json": {
+            "package_id": package(), "weekdays": ["Sunday"], "cancelled": random.choice([True, False])}}, 20),
+        ("list_classes_page", "GET", lambda: "/api/classes", lambda: {"params": {"limit": 100}}, None),
+        ("get_class", "GET", lambda: f"/api/classes/{klass()}", none, None),
+        ("create_class", "POST", lambda: "/api/classes", lambda: {"params": {
+            "package_id": package(), "date": "2025-06-01", "start_time": "16:00", "end_time": "17:00", "location": "Court 1"}}, None),
+        ("cancel_class", "POST", lambda: f"/api/classes/{klass()}/cancel", none, None),
+        ("get_attendance", "GET", lambda: f"/api/attendance/{klass()}", none, None),
+        ("mark_attendance", "POST", lambda: "/api/attendance/mark", lambda: {"json": {
+            "class_id": klass(), "user_id": user(), "status": "present"}}, None),
+        ("mark_bulk", "POST", lambda: "/api/attendance/mark_bulk", lambda: {"json": {
+            "class_id": klass(), "entries": [{"user_id": user(), "status": "late"} for _ in range(25)]}}, None),
+        ("comprehensive_page", "GET", lambda: f"/api/attendance/comprehensive/{klass()}", lambda: {"params": {"limit": 50}}, None),
+        ("comprehensive_all", "GET", lambda: f"/api/attendance/comprehensive/{klass()}", none, 20),
+        ("unchecked", "GET", lambda: f"/api/attendance/unchecked/{klass()}", none, 20),
+        ("add_user", "POST", lambda: f"/api/attendance/add_user/{klass()}", lambda: {"json": {"name": walk_in()}}, None),
+        ("delete_attendance", "DELETE", lambda: f"/api/attendance/{klass()}/{user()}", none, None),
+        ("delete_class_attendance", "DELETE", lambda: f"/api/attendance/class/{klass()}/all", none, 20),
+        ("delete_package_attendance", "DELETE", lambda: f"/api/packages/{package()}/attendance", lambda: {"params": {
+            "start_date": "2025-06-01", "end_date": "2025-06-07"}}, 20),
+        ("purge_dry_run", "DELETE", lambda: "/api/attendance", lambda: {"params": {"before": "2025-02-01", "dry_run": True}}, 20),
+        ("export_csv", "GET", lambda: "/api/export", lambda: {"params": {"format": "csv", "tables": "classes"}}, 5),
+        ("export_ndjson_gzip", "GET", lambda: "/api/export", lambda: {"params": {"gzip": True}}, 3),
+        ("import_bundle", "POST", lambda: "/api/import", lambda: {"content": import_bundle(next(counter))}, 10),
+        ("roster_dry_run", "POST", lambda: "/api/users/roster", lambda: {
+            "params": {"dry_run": True}, "files": {"file": roster_csv(next(counter), user)}}, 20),
+        ("roster_enroll", "POST", lambda: "/api/users/roster", lambda: {"files": {"file": roster_csv(next(counter), user)}}, 20),
+        ("report_classes", "GET", lambda: "/api/reports/classes", lambda: {"params": {"start_date": "2025-03-01", "end_date": "2025-03-31"}}, None),
+        ("report_package", "GET", lambda: f"/api/reports/packages/{package()}", none, None),
+        ("report_user", "GET", lambda: f"/api/reports/users/{user()}", none, None),
+        ("generate_qr", "POST", lambda: "/api/generate_qr", lambda: {"json": {"name": random.choice([walk_in(), f"student{user() - 1}@example.com"])}}, None),
+        ("badges_zip", "GET", lambda: "/api/badges", lambda: {"params": {"user_ids": [user() for _ in range(12)], "format": "zip"}}, 5),
+        ("scan_signed", "POST", lambda: "/api/attendance/scan", lambda: {"json": {
+            "qr_data": qr.sign_user_token(user()), "class_id": klass(), "status": "present"}}, None),
+        ("scan_name", "POST", lambda: "/api/attendance/scan", lambda: {"json": {
+            "qr_data": random.choice([walk_in(), f"student{user() - 1}@example.com"]), "class_id": klass(), "status": "late"}}, None),
+        ("scan_sync", "POST", lambda: "/api/attendance/scan/sync", lambda: {"json": {"scans": [
+            {"idempotency_key": f"bench-{next(counter)}", "qr_data": qr.sign_user_token(user()), "class_id": klass(),
+             "scanned_at": "2025-06-01T16:05:00"} for _ in range(20)]}}, None),
+        # Last, since it deletes a slice of the dataset; later runs find little left to purge
+        ("purge_attendance", "DELETE", lambda: "/api/attendance", lambda: {"params": {"before": "2025-01-13", "chunk_size": 1000}}, 3),
+        ("metrics", "GET", lambda: "/metrics", none, None),
+        ("pool_stats", "GET", lambda: "/api/internal/pool", none, None),
+    ]
+
+def percentile(values, p):
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0.0
+
+def rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run_worker(args):
+    """Seed and benchmark the database in DATABASE_URL; writes results to args.result_file"""
+    from fastapi.testclient import TestClient
+    from sqlalchemy import func, select
+    # The synthetic academy only needs some key to exercise signed badges
+    os.environ.setdefault("QR_SIGNING_KEYS", "1:benchmark-only")
+    from app import models, qr
+    from app.database import engine
+
+    started = time.perf_counter()
+    dataset = seed(engine, args.scale)
+    seed_seconds = time.perf_counter() - started
+    if dataset:
+        print(f"  seeded {dataset['users']} users, {dataset['packages']} packages, {dataset['classes']} classes "
+              f"and {dataset['attendance']} attendance rows in {seed_seconds:.1f}s", flush=True)
+
+    from app.main import app
+
+    with engine.connect() as connection:
+        ids = {
+            name: tuple(connection.execute(select(func.min(model.id), func.max(model.id))).one())
+            for name, model in [("users", models.User), ("packages", models.Package), ("classes", models.Class)]
+        }
+        counts = {
+            name: connection.execute(select(func.count()).select_from(model)).scalar()
+            for name, model in [("users", models.User), ("packages", models.Package),
+                                ("classes", models.Class), ("attendance", models.Attendance)]
+        }
+
+    random.seed(7)
+    routes = {}
+    # Handlers print debug lines; keep them out of the report and the timings
+    quiet = open(os.devnull, "w")
+    with TestClient(app) as client:
+        for name, method, path, kwargs, limit in scenarios(ids, qr):
+            if args.only and name not in args.only:
+                continue
+            requests = min(limit or args.requests, args.requests)
+            with contextlib.redirect_stdout(quiet):
+                for _ in range(min(3, requests)):
+                    client.request(method, path(), **kwargs())
+
+            if args.trace_memory:
+                tracemalloc.start()
+            rss_before = rss_mb()
+            latencies = []
+            errors = 0
+            client_errors = 0
+            begin = time.perf_counter()
+            with contextlib.redirect_stdout(quiet):
+                for _ in range(requests):
+                    request_path, request_kwargs = path(), kwargs()
+                    start = time.perf_counter()
+                    response = client.request(method, request_path, **request_kwargs)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    # 4xx is expected for some scenarios, e.g. deleting a record that is not there
+                    if response.status_code >= 500:
+                        errors += 1
+                    elif response.status_code >= 400:
+                        client_errors += 1
+            elapsed = time.perf_counter() - begin
+            traced_peak = None
+            if args.trace_memory:
+                traced_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+                tracemalloc.stop()
+
+            latencies.sort()
+            routes[name] = {
+                "method": method,
+                "requests": requests,
+                "errors": errors,
+                "client_errors": client_errors,
+                "p50_ms": round(percentile(latencies, 0.50), 3),
+                "p95_ms": round(percentile(latencies, 0.95), 3),
+                "p99_ms": round(percentile(latencies, 0.99), 3),
+                "mean_ms": round(sum(latencies) / len(latencies), 3),
+                "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+                "rss_peak_mb": round(rss_mb(), 1),
+                "rss_growth_mb": round(rss_mb() - rss_before, 1),
+                "traced_peak_mb": round(traced_peak, 1) if traced_peak is not None else None,
+            }
+            print(f"  {name:26} p50 {routes[name]['p50_ms']:8.2f} ms  p95 {routes[name]['p95_ms']:8.2f} ms  "
+                  f"p99 {routes[name]['p99_ms']:8.2f} ms  {routes[name]['throughput_rps']:8.1f} req/s"
+                  + (f"  {errors} errors" if errors else ""), flush=True)
+
+    with open(args.result_file, "w") as f:
+        json.dump({
+            "database": engine.dialect.name,
+            "url": redact(os.environ["DATABASE_URL"]),
+            "dataset": counts,
+            "seeded": dataset is not None,
+            "seed_seconds": round(seed_seconds, 1),
+            "routes": routes,
+        }, f)
+
+def compare(results, previous_path):
+    """Print p95 changes against an earlier results file"""
+    with open(previous_path) as f:
+        previous = {run["database"]: run for run in json.load(f)["runs"]}
+    print("\nChange in p95 against", previous_path)
+    for run in results["runs"]:
+        before = previous.get(run["database"])
+        if not before:
+            continue
+        print(f"{run['database']}:")
+        for name, route in run["routes"].items():
+            old = before["routes"].get(name)
+            if old and old["p95_ms"]:
+                change = (route["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+                flag = "  <-- slower" if change > 20 else ""
+                print(f"  {name:26} {old['p95_ms']:8.2f} -> {route['p95_ms']:8.2f} ms ({change:+.0f}%){flag}")
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark every API route against a synthetic academy")
+    parser.add_argument("--database-url", action="append", help="database to benchmark; repeat for several (default: a fresh SQLite file)")
+    parser.add_argument("--scale", type=float, default=1.0, help="dataset size relative to 20k users / 500 packages / 20k classes / 2M attendance rows")
+    parser.add_argument("--requests", type=int, default=200, help="timed requests per route (heavy routes run fewer)")
+    parser.add_argument("--only", nargs="*", help="benchmark only these scenario names")
+    parser.add_argument("--trace-memory", action="store_true", help="also report tracemalloc peaks (slows requests down)")
+    parser.add_argument("--output", default="benchmark_results.json", help="machine-readable results file")
+    parser.add_argument("--compare", help="earlier results file to compare p95 latencies against")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    print(f"🎾 Tennis Academy MVP - Endpoint Benchmark")
+    print(f"scale {args.scale}, {args.requests} requests per route")
+    print("=" * 50)
+
+    results = {"started_at": datetime.now().isoformat(timespec="seconds"), "commit": git_commit(),
+               "scale": args.scale, "requests": args.requests, "runs": []}
+    with tempfile.TemporaryDirectory() as directory:
+        urls = args.database_url or [f"sqlite:///{os.path.join(directory, 'benchmark.db')}"]
+        for url in urls:
+            print(f"{redact(url)}:", flush=True)
+            result_file = os.path.join(directory, "result.json")
+            command = [sys.executable, os.path.abspath(__file__), "--worker", "--result-file", result_file,
+                       "--scale", str(args.scale), "--requests", str(args.requests)]
+            if args.only:
+                command += ["--only", *args.only]
+            if args.trace_memory:
+                command.append("--trace-memory")
+            completed = subprocess.run(command, env={**os.environ, "DATABASE_URL": url})
+            if completed.returncode != 0:
+                print(f"❌ Benchmark failed for {redact(url)}")
+                continue
+            with open(result_file) as f:
+                results["runs"].append(json.load(f))
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n✅ Results written to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - SQLite Concurrency Benchmark
+Compare concurrent scan throughput on SQLite with the default rollback journal
+against the WAL performance profile from app/database.py
+
+Usage: python benchmark_sqlite_concurrency.py [scanners] [scans_per_scanner] [roster_readers]
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, time as dt_time
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import crud, models
+from app.database import Base, apply_sqlite_pragmas
+
+STUDENTS = 2000
+CLASSES = 20
+
+def build_engine(path, profile):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False}, pool_size=32, max_overflow=32)
+    if profile:
+        event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
+
+def seed(engine):
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(insert(models.Package.__table__).values(
+            name="Benchmark", description="", price=0, start_date=date(2025, 1, 1), end_date=date(2025, 12, 31)
+        ))
+        connection.execute(insert(models.Class.__table__), [
+            {"package_id": 1, "date": date(2025, 1, 1 + i), "start_time": dt_time(16), "end_time": dt_time(17), "location": "Court 1"}
+            for i in range(CLASSES)
+        ])
+        connection.execute(insert(models.User.__table__), [
+            {"name": f"Student {i}", "email": f"student{i}@example.com", "role": "student"}
+            for i in range(STUDENTS)
+        ])
+
+def run(profile, scanners, scans_per_scanner, readers):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = build_engine(os.path.join(directory, "bench.db"), profile)
+        seed(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        latencies = []
+        errors = {"locked": 0, "other": 0}
+        reads = [0]
+        lock = threading.Lock()
+        done = threading.Event()
+
+        def scanner(index):
+            db = Session()
+            try:
+                for n in range(scans_per_scanner):
+                    user_id = (index * scans_per_scanner + n) % STUDENTS + 1
+                    class_id = (index + n) % CLASSES + 1
+                    start = time.perf_counter()
+                    try:
+                        crud.check_in_attendance(db, class_id, user_id)
+                        with lock:
+                            latencies.append(time.perf_counter() - start)
+                    except OperationalError as e:
+                        db.rollback()
+                        with lock:
+                            errors["locked" if "locked" in str(e) else "other"] += 1
+            finally:
+                db.close()
+
+        def reader(index):
+            db = Session()
+            try:
+                while not done.is_set():
+                    try:
+                        crud.get_comprehensive_attendance_for_class(db, index % CLASSES + 1)
+                        db.rollback()
+                        with lock:
+                            reads[0] += 1
+                    except OperationalError:
+                        db.rollback()
+                        with lock:
+                            errors["locked"] += 1
+            finally:
+                db.close()
+
+        reader_threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        scanner_threads = [threading.Thread(target=scanner, args=(i,)) for i in range(scanners)]
+        for thread in reader_threads:
+            thread.start()
+        start = time.perf_counter()
+        for thread in scanner_threads:
+            thread.start()
+        for thread in scanner_threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for thread in reader_threads:
+            thread.join()
+        engine.dispose()
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(int(len(latencies) * p), len(latencies) - 1)] * 1000 if latencies else 0.0
+    return {
+        "scans": len(latencies),
+        "scans_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "roster_reads": reads[0],
+        "locked_errors": errors["locked"],
+        "other_errors": errors["other"],
+    }
+
+def main():
+    scanners = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    scans_per_scanner = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    readers = int(sys.argv[3]) if len(sys.argv) > 3 else 2
+
+    print(f"🎾 Tennis Academy MVP - SQLite Concurrency Benchmark")
+    print(f"{scanners} scanners x {scans_per_scanner} scans, {readers} roster readers")
+    print("=" * 50)
+
+    for label, profile in [("rollback journal (before)", False), ("WAL profile (after)", True)]:
+        result = run(profile, scanners, scans_per_scanner, readers)
+        print(f"{label}:")
+        print(f"  {result['scans']} scans at {result['scans_per_second']:.0f}/s, "
+              f"p50 {result['p50_ms']:.1f} ms, p95 {result['p95_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms")
+        print(f"  {result['roster_reads']} roster reads, "
+              f"{result['locked_errors']} 'database is locked' errors, {result['other_errors']} other errors")
+
+if __name__ == "__main__":
+    main()
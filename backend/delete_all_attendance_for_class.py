@@ -3,20 +3,16 @@
 Delete all attendance records for a given class_id.
 """
 from app.database import SessionLocal
-from app.models import Attendance
+from app import crud
 
 if __name__ == "__main__":
     class_id = int(input("Enter the class_id to delete all attendance for: "))
     db = SessionLocal()
     try:
-        records = db.query(Attendance).filter(Attendance.class_id == class_id).all()
-        count = len(records)
-        for record in records:
-            db.delete(record)
-        db.commit()
+        count = crud.clear_class_attendance(db, class_id)
         print(f"Deleted {count} attendance record(s) for class_id {class_id}.")
     except Exception as e:
         print(f"Error deleting attendance: {e}")
         db.rollback()
     finally:
-        db.close() 
\ No newline at end of file
+        db.close() 
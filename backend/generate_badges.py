@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - QR Badge Generator
+Write a printable PDF (or a ZIP of PNGs) of QR badges for a package's students or a list of users
+
+Usage: python generate_badges.py [--package ID] [--users ID,ID,...] [--format pdf|zip] [--output FILE]
+"""
+
+import argparse
+import sys
+import os
+from dotenv import load_dotenv
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app import badges, crud
+
+load_dotenv()
+
+def main():
+    """Generate QR badges"""
+    parser = argparse.ArgumentParser(description="Generate QR badges for students")
+    parser.add_argument("--package", type=int, help="only students who attended this package's classes")
+    parser.add_argument("--users", help="comma-separated user ids (overrides --package)")
+    parser.add_argument("--format", choices=["pdf", "zip"], default="pdf")
+    parser.add_argument("--output", help="output file (default: badges.<format>)")
+    args = parser.parse_args()
+    
+    user_ids = [int(user_id) for user_id in args.users.split(",")] if args.users else None
+    output = args.output or f"badges.{args.format}"
+    
+    print(f"🎾 Tennis Academy MVP - Badge Generator")
+    print("=" * 50)
+    
+    db = SessionLocal()
+    try:
+        users = crud.get_badge_users(db, package_id=args.package, user_ids=user_ids)
+    finally:
+        db.close()
+    
+    stream = badges.stream_badge_pdf(users) if args.format == "pdf" else badges.stream_badge_zip(users)
+    with open(output, "wb") as f:
+        for chunk in stream:
+            f.write(chunk)
+    
+    print(f"✅ Wrote {len(users)} badge(s) to {output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - Scan Station Load Simulator
+Simulate N scanning phones hitting /api/attendance/scan at the same moment and report
+throughput, tail latency, lock/timeout errors and duplicate-row anomalies
+
+Usage: python load_test_scans.py [--base-url http://localhost:8000] [--devices 10] [--scans 60]
+       python load_test_scans.py --database-url sqlite:///./load.db --database-url postgresql://localhost/tennis_load
+
+With --database-url the simulator starts its own server (uvicorn, --workers processes) on
+each database in turn; otherwise it targets the server already running at --base-url.
+Each run creates its own package, classes and students, so use a scratch database.
+"""
+
+import argparse
+import base64
+import json
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from types import SimpleNamespace
+
+import httpx
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import qr
+
+class Station:
+    """One coach's phone: scans a class roster in a shuffled order, with realistic noise"""
+
+    def __init__(self, index, class_id, roster, walk_ins, args):
+        self.index = index
+        self.class_id = class_id
+        self.roster = roster
+        self.walk_ins = walk_ins
+        self.args = args
+        self.random = random.Random(index)
+        self.results = []
+
+    def payloads(self):
+        queue = self.roster[:]
+        self.random.shuffle(queue)
+        scanned = []
+        for n in range(self.args.scans):
+            roll = self.random.random()
+            if scanned and roll < self.args.repeat_rate:
+                # The same badge read twice, e.g. held in front of the camera too long
+                payload = self.random.choice(scanned)
+            elif roll < self.args.repeat_rate + self.args.walk_in_rate:
+                # Walk-ins are shared between stations so several create the same name at once
+                payload = self.random.choice(self.walk_ins)
+            else:
+                user = queue[n % len(queue)]
+                payload = qr.user_qr_data(SimpleNamespace(**user)) if not self.args.legacy_badges else f"{user['id']}:{user['name']}"
+            scanned.append(payload)
+            status = "late" if n >= self.args.scans * (1 - self.args.late_rate) else "present"
+            yield payload, status
+
+    def run(self, base_url, start):
+        with httpx.Client(base_url=base_url, timeout=self.args.timeout) as client:
+            start.wait()
+            for payload, status in self.payloads():
+                began = time.perf_counter()
+                outcome, body = "error", None
+                try:
+                    response = client.post("/api/attendance/scan", json={"qr_data": payload, "class_id": self.class_id, "status": status})
+                    body = response.json() if response.headers.get("content-type", "").startswith("application/json") else response.text
+                    if response.status_code >= 500:
+                        detail = str(body).lower()
+                        outcome = "lock_error" if "locked" in detail or "deadlock" in detail else (
+                            "pool_timeout" if "queuepool" in detail or "timed out" in detail else "server_error")
+                    elif response.status_code >= 400:
+                        outcome = "client_error"
+                    elif body.get("success"):
+                        outcome = "marked"
+                    elif body.get("already_present"):
+                        outcome = "already_present"
+                    else:
+                        outcome = "rejected"
+                except httpx.TimeoutException:
+                    outcome = "client_timeout"
+                except httpx.HTTPError as e:
+                    outcome, body = "connection_error", str(e)
+                self.results.append({
+                    "latency": time.perf_counter() - began,
+                    "outcome": outcome,
+                    "payload": payload,
+                    "user_name": body.get("user_name") if isinstance(body, dict) else None,
+                    "detail": None if outcome in ("marked", "already_present") else str(body)[:300],
+                })
+                if self.args.think_time:
+                    time.sleep(self.random.uniform(0, 2 * self.args.think_time))
+
+def setup(client, args, run_id):
+    """Create a package, one class per group of stations and a roster of students per class"""
+    package = client.post("/api/packages", params={
+        "name": f"Load test {run_id}", "description": "Scan load simulation", "price": 0,
+        "start_date": "2025-01-01", "end_date": "2025-12-31"
+    }).json()
+    classes = []
+    for n in range(args.classes):
+        response = client.post("/api/classes", params={
+            "package_id": package["id"], "date": "2025-06-02", "start_time": "16:00", "end_time": "17:00",
+            "location": f"Court {n + 1}"
+        })
+        response.raise_for_status()
+        classes.append(response.json()["id"])
+
+    rosters = {}
+    for class_id in classes:
+        roster = []
+        for n in range(args.roster):
+            name = f"Load {run_id} C{class_id} S{n}"
+            response = client.post("/api/users", json={"name": name, "email": f"load-{run_id}-{class_id}-{n}@example.com"})
+            response.raise_for_status()
+            roster.append({"id": response.json()["id"], "name": name})
+        rosters[class_id] = roster
+    walk_ins = [f"Walk In {run_id} {n}" for n in range(max(args.devices // 2, 2))]
+    return classes, rosters, walk_ins
+
+def check_anomalies(client, stations, classes, walk_ins, first_user_id):
+    """Compare what stations were told with what the database holds"""
+    anomalies = {"duplicate_attendance_rows": 0, "double_check_ins": 0, "missing_rows": 0, "duplicate_walk_in_users": 0}
+
+    marked = Counter()
+    for station in stations:
+        for result in station.results:
+            if result["outcome"] == "marked":
+                marked[(station.class_id, result["user_name"])] += 1
+    anomalies["double_check_ins"] = sum(count - 1 for count in marked.values() if count > 1)
+
+    for class_id in classes:
+        records = client.get(f"/api/attendance/{class_id}").json()
+        per_user = Counter(record["user_id"] for record in records)
+        anomalies["duplicate_attendance_rows"] += sum(count - 1 for count in per_user.values() if count > 1)
+        rows = client.get(f"/api/attendance/comprehensive/{class_id}").json()
+        present = {row["name"] for row in rows if row["attendance_id"] is not None}
+        anomalies["missing_rows"] += sum(1 for (marked_class, name) in marked if marked_class == class_id and name not in present)
+
+    # Page through the users created since setup (the cursor is the last id seen, as /api/users encodes it)
+    names = Counter()
+    cursor = base64.urlsafe_b64encode(json.dumps([first_user_id - 1]).encode()).decode()
+    while cursor:
+        response = client.get("/api/users", params={"limit": 1000, "cursor": cursor})
+        names.update(user["name"].lower() for user in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+    anomalies["duplicate_walk_in_users"] = sum(max(names[name.lower()] - 1, 0) for name in walk_ins)
+    return anomalies
+
+def simulate(base_url, args):
+    run_id = uuid.uuid4().hex[:6]
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        classes, rosters, walk_ins = setup(client, args, run_id)
+
+    stations = [Station(i, classes[i % len(classes)], rosters[classes[i % len(classes)]], walk_ins, args) for i in range(args.devices)]
+    start = threading.Event()
+    threads = [threading.Thread(target=station.run, args=(base_url, start)) for station in stations]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.5)
+    began = time.perf_counter()
+    start.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    results = [result for station in stations for result in station.results]
+    latencies = sorted(result["latency"] * 1000 for result in results)
+    def percentile(p):
+        return round(latencies[min(int(len(latencies) * p), len(latencies) - 1)], 2) if latencies else 0.0
+
+    with httpx.Client(base_url=base_url, timeout=60) as client:
+        anomalies = check_anomalies(client, stations, classes, walk_ins, rosters[classes[0]][0]["id"])
+
+    return {
+        "devices": args.devices,
+        "scans": len(results),
+        "seconds": round(elapsed, 2),
+        "scans_per_second": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1], 2) if latencies else 0.0,
+        "outcomes": dict(Counter(result["outcome"] for result in results)),
+        "error_samples": sorted({result["detail"] for result in results if result["outcome"].endswith(("error", "timeout"))})[:5],
+        "anomalies": anomalies,
+    }
+
+def start_server(database_url, port, workers):
+    """Start uvicorn on database_url and wait until it answers"""
+    # Create the schema first; workers each run create_all at import and race on a new database
+    subprocess.run([sys.executable, "-c", "import app.main"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                   env={**os.environ, "DATABASE_URL": database_url}, check=True)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, "DATABASE_URL": database_url},
+        stdout=subprocess.DEVNULL
+    )
+    for _ in range(100):
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"server on {database_url} did not start")
+
+def report(label, result):
+    print(f"{label}:")
+    print(f"  {result['scans']} scans from {result['devices']} devices in {result['seconds']}s "
+          f"({result['scans_per_second']}/s)")
+    print(f"  latency p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms, max {result['max_ms']} ms")
+    print(f"  outcomes: " + ", ".join(f"{name} {count}" for name, count in sorted(result["outcomes"].items())))
+    for detail in result["error_samples"]:
+        print(f"  error: {detail}")
+    problems = {name: count for name, count in result["anomalies"].items() if count}
+    if problems:
+        print(f"  ❌ anomalies: " + ", ".join(f"{name} {count}" for name, count in problems.items()))
+    else:
+        print(f"  ✅ no duplicate rows, double check-ins, lost scans or duplicate walk-in users")
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate concurrent QR scanning stations")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="server to target when no --database-url is given")
+    parser.add_argument("--database-url", action="append", help="start a server on this database and target it; repeat to compare")
+    parser.add_argument("--workers", type=int, default=2, help="uvicorn worker processes for servers started with --database-url")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--devices", type=int, default=10, help="concurrent scanning phones")
+    parser.add_argument("--scans", type=int, default=60, help="scans per device")
+    parser.add_argument("--classes", type=int, default=3, help="classes the devices are spread over")
+    parser.add_argument("--roster", type=int, default=25, help="students per class")
+    parser.add_argument("--repeat-rate", type=float, default=0.15, help="share of scans that re-read a badge already scanned")
+    parser.add_argument("--walk-in-rate", type=float, default=0.05, help="share of scans of typed walk-in names")
+    parser.add_argument("--late-rate", type=float, default=0.2, help="share of each device's scans, at the end, marked late")
+    parser.add_argument("--think-time", type=float, default=0.0, help="mean seconds between a device's scans (0 = flat out)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="client timeout per scan in seconds")
+    parser.add_argument("--legacy-badges", action="store_true", help="send unsigned id:name badges instead of signed tokens")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    print(f"🎾 Tennis Academy MVP - Scan Station Load Simulator")
+    print(f"{args.devices} devices x {args.scans} scans over {args.classes} classes")
+    print("=" * 50)
+
+    results = {}
+    if args.database_url:
+        for database_url in args.database_url:
+            server = start_server(database_url, args.port, args.workers)
+            try:
+                results[database_url] = simulate(f"http://127.0.0.1:{args.port}", args)
+            finally:
+                server.terminate()
+                server.wait()
+            report(database_url, results[database_url])
+    else:
+        results[args.base_url] = simulate(args.base_url, args)
+        report(args.base_url, results[args.base_url])
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Migration script to add attendance.previous_status, which the attendance aggregates
+read from each upsert to apply +1/-1 deltas
+"""
+from sqlalchemy import inspect, text
+from app.database import engine
+
+def migrate_attendance_previous_status():
+    """Add the previous_status column if missing; existing rows need no value"""
+    with engine.begin() as conn:
+        columns = [column["name"] for column in inspect(conn).get_columns("attendance")]
+        if "previous_status" not in columns:
+            conn.execute(text("ALTER TABLE attendance ADD COLUMN previous_status VARCHAR"))
+            print("Added attendance.previous_status")
+        else:
+            print("attendance.previous_status is already in place")
+
+if __name__ == "__main__":
+    migrate_attendance_previous_status()
@@ -0,0 +1,28 @@
+#!/usr/bin/env python3
+"""
+Migration script to dedupe attendance rows and add the (class_id, user_id) unique index
+"""
+from sqlalchemy import text
+from app.database import engine
+
+def migrate_attendance_unique():
+    """Keep the latest row per (class_id, user_id) and create the unique index the upsert relies on"""
+    with engine.begin() as conn:
+        # The highest id is the most recently inserted row for each pair
+        result = conn.execute(text("""
+            DELETE FROM attendance
+            WHERE id NOT IN (
+                SELECT keep_id FROM (
+                    SELECT MAX(id) AS keep_id FROM attendance GROUP BY class_id, user_id
+                ) AS latest
+            )
+        """))
+        print(f"Removed {result.rowcount} duplicate attendance row(s)")
+
+        conn.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_attendance_class_user ON attendance (class_id, user_id)"
+        ))
+        print("Unique index ix_attendance_class_user is in place")
+
+if __name__ == "__main__":
+    migrate_attendance_unique()
@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the (package_id, date) index to an existing classes table
+"""
+from app.database import engine
+from app.models import Class
+
+def migrate_class_indexes():
+    """Create indexes declared on Class that create_all skips for an existing table"""
+    for index in Class.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+        print(f"Index {index.name} is in place")
+
+if __name__ == "__main__":
+    migrate_class_indexes()
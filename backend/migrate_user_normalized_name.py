@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Migration script to add and backfill users.normalized_name, with its index
+"""
+from sqlalchemy import bindparam, inspect, select, text, update
+from app.database import engine
+from app.models import User, normalize_name
+
+def migrate_user_normalized_name():
+    """Add the normalized_name column if missing, fill it for existing users and index it"""
+    with engine.begin() as conn:
+        columns = [column["name"] for column in inspect(conn).get_columns("users")]
+        if "normalized_name" not in columns:
+            conn.execute(text("ALTER TABLE users ADD COLUMN normalized_name VARCHAR"))
+            print("Added users.normalized_name")
+
+        rows = conn.execute(select(User.id, User.name).where(User.normalized_name.is_(None))).all()
+        if rows:
+            conn.execute(
+                update(User.__table__).where(User.__table__.c.id == bindparam("user_id")).values(normalized_name=bindparam("normalized")),
+                [{"user_id": row.id, "normalized": normalize_name(row.name)} for row in rows]
+            )
+        print(f"Backfilled normalized_name for {len(rows)} user(s)")
+
+        for index in User.__table__.indexes:
+            index.create(bind=conn, checkfirst=True)
+        print("Index ix_users_normalized_name is in place")
+
+if __name__ == "__main__":
+    migrate_user_normalized_name()
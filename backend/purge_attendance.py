@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - Attendance Purge
+Delete attendance records and scan receipts of classes dated before a cutoff
+
+Usage: python purge_attendance.py 2024-01-01 [--chunk-size 5000] [--dry-run]
+
+Rows are deleted in chunks, each committed on its own, so the app keeps taking
+scans while a large purge runs.
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+from dotenv import load_dotenv
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import crud
+from app.database import SessionLocal
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Purge attendance of classes before a date")
+    parser.add_argument("before", type=date.fromisoformat, help="keep classes on or after this date (YYYY-MM-DD)")
+    parser.add_argument("--chunk-size", type=int, default=crud.PURGE_CHUNK_SIZE, help="rows deleted per transaction")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be deleted")
+    args = parser.parse_args()
+
+    print(f"🎾 Tennis Academy MVP - Attendance Purge")
+    print(f"Classes before: {args.before}")
+    print("=" * 50)
+
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            attendance, receipts = crud.count_attendance_before(db, args.before)
+            print(f"Would delete {attendance} attendance record(s) and {receipts} scan receipt(s).")
+            return
+        result = crud.purge_attendance_before(db, args.before, chunk_size=args.chunk_size)
+        print(f"✅ Deleted {result['attendance']} attendance record(s) from {result['classes']} class(es) "
+              f"and {result['scan_receipts']} scan receipt(s) in {result['chunks']} chunk(s).")
+    except Exception as e:
+        print(f"❌ Error purging attendance: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tennis Academy MVP - Attendance Stats Rebuild
+Recompute the per-class and per-student attendance aggregates from attendance
+
+Usage: python rebuild_attendance_stats.py [--check]
+
+The aggregates are kept up to date on every attendance write; run this once after
+creating the tables, after editing attendance outside the app, or when --check
+reports drift.
+"""
+
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+# Add the app directory to the Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import crud
+from app.database import SessionLocal
+
+load_dotenv()
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the attendance aggregate tables")
+    parser.add_argument("--check", action="store_true", help="only count rows that differ from attendance")
+    args = parser.parse_args()
+
+    print(f"🎾 Tennis Academy MVP - Attendance Stats Rebuild")
+    print("=" * 50)
+
+    db = SessionLocal()
+    try:
+        if args.check:
+            drift = crud.check_attendance_stats(db)
+            for table, count in drift.items():
+                print(f"   {'✅' if not count else '⚠️ '} {table}: {count} row(s) out of date")
+            if any(drift.values()):
+                sys.exit(1)
+            return
+        for table, count in crud.rebuild_attendance_stats(db).items():
+            print(f"   ✅ {table}: {count} row(s)")
+    except Exception as e:
+        print(f"❌ Error rebuilding attendance stats: {e}")
+        db.rollback()
+        sys.exit(1)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Test settings: a throwaway SQLite database and a fixed badge signing key, set before app is imported"""
+import os
+import tempfile
+from itertools import count
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}")
+os.environ.setdefault("QR_SIGNING_KEYS", "1:test-only")
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+_ids = count(1)
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def class_id(client):
+    """A fresh class in a fresh package"""
+    package = client.post("/api/packages", params={
+        "name": f"Package {next(_ids)}",
+        "description": "Test package",
+        "price": 100,
+        "start_date": "2025-01-01",
+        "end_date": "2025-03-31",
+    }).json()
+    return client.post("/api/classes", params={
+        "package_id": package["id"],
+        "date": "2025-01-06",
+        "start_time": "16:00",
+        "end_time": "17:00",
+        "location": "Court 1",
+    }).json()["id"]
+
+@pytest.fixture
+def make_student(client):
+    def make_student(name=None):
+        n = next(_ids)
+        return client.post("/api/users", json={
+            "name": name or f"Student {n}",
+            "email": f"student{n}@example.com",
+            "role": "student",
+        }).json()
+    return make_student
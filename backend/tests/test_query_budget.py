@@ -0,0 +1,53 @@
+"""Statement budgets for the hot attendance endpoints, pinned at their measured counts"""
+import pytest
+
+from app import database, qr
+from app.query_budget import assert_query_budget
+
+# mark, comprehensive and scan run on the async engine with DB_MODE=async; mark_bulk
+# is sync in both modes
+HOT_ENGINE = database.async_engine.sync_engine if database.DB_MODE == "async" else database.engine
+
+@pytest.fixture
+def students(make_student):
+    return [make_student() for _ in range(30)]
+
+def scan(client, class_id, qr_data, budget):
+    response = assert_query_budget(client, "POST", "/api/attendance/scan", budget, engine=HOT_ENGINE,
+                                   json={"qr_data": qr_data, "class_id": class_id})
+    assert response.status_code == 200
+    return response.json()
+
+def test_signed_scan(client, class_id, students):
+    # Check-in upsert returning the name, then the two aggregate deltas
+    badge = qr.sign_user_token(students[0]["id"])
+    assert scan(client, class_id, badge, 3)["success"]
+    # Upsert that writes nothing, then one read for the existing status
+    assert scan(client, class_id, badge, 2)["already_present"]
+
+def test_name_scan(client, class_id, students):
+    # Name lookup, check-in upsert and the two aggregate deltas
+    assert scan(client, class_id, students[0]["name"], 4)["registration_message"] == "Student found by name"
+
+def test_walk_in_scan(client, class_id):
+    # Name lookup, user insert and its refresh, check-in upsert and the two deltas
+    assert scan(client, class_id, "Walk In Budget", 6)["registration_message"] == "New student added"
+
+def test_mark(client, class_id, students):
+    body = {"class_id": class_id, "user_id": students[0]["id"], "status": "late"}
+    # Upsert and the two aggregate deltas
+    assert_query_budget(client, "POST", "/api/attendance/mark", 3, engine=HOT_ENGINE, json=body)
+    # An unchanged status leaves the aggregates alone
+    assert_query_budget(client, "POST", "/api/attendance/mark", 1, engine=HOT_ENGINE, json=body)
+
+def test_mark_bulk(client, class_id, students):
+    # Class and user checks, one multi-row upsert, the two deltas and the counts
+    response = assert_query_budget(client, "POST", "/api/attendance/mark_bulk", 6, json={
+        "class_id": class_id,
+        "entries": [{"user_id": student["id"], "status": "present"} for student in students],
+    })
+    assert response.json()["counts"]["present"] == len(students)
+
+def test_comprehensive(client, class_id, students):
+    response = assert_query_budget(client, "GET", f"/api/attendance/comprehensive/{class_id}", 1, engine=HOT_ENGINE)
+    assert len(response.json()) >= len(students)
@@ -0,0 +1,11 @@
+from collections import Counter
+
+from app.main import app
+
+def test_each_path_has_a_single_handler():
+    routes = Counter(
+        (route.path, method)
+        for route in app.routes
+        for method in getattr(route, "methods", None) or ()
+    )
+    assert [key for key, n in routes.items() if n > 1] == []
@@ -0,0 +1,45 @@
+from sqlalchemy import delete
+
+from app import models, qr
+from app.database import SessionLocal
+
+def scan(client, class_id, qr_data, status="present"):
+    response = client.post("/api/attendance/scan", json={"qr_data": qr_data, "class_id": class_id, "status": status})
+    assert response.status_code == 200
+    return response.json()
+
+def test_signed_badge_checks_in_with_the_name_from_the_upsert(client, class_id, make_student):
+    student = make_student()
+    result = scan(client, class_id, qr.sign_user_token(student["id"]))
+    assert result["success"] and result["is_registered"]
+    assert result["user_name"] == student["name"]
+
+    again = scan(client, class_id, qr.sign_user_token(student["id"]))
+    assert not again["success"] and again["already_present"]
+    assert again["message"] == "Already marked present"
+    assert again["user_name"] == student["name"]
+
+def test_signed_badge_of_a_deleted_user_writes_nothing(client, class_id, make_student):
+    student = make_student()
+    badge = qr.sign_user_token(student["id"])
+    # Prime the identity cache, then delete the user behind its back
+    scan(client, class_id, badge)
+    client.delete(f"/api/attendance/{class_id}/{student['id']}")
+    with SessionLocal() as db:
+        db.execute(delete(models.User).where(models.User.id == student["id"]))
+        db.commit()
+
+    result = scan(client, class_id, badge)
+    assert result == {**result, "success": False, "message": "Unknown student"}
+    with SessionLocal() as db:
+        assert db.query(models.Attendance).filter_by(class_id=class_id, user_id=student["id"]).count() == 0
+
+def test_forged_badge_is_rejected(client, class_id, make_student):
+    student = make_student()
+    result = scan(client, class_id, f"QA1.{student['id']}.AAAAAAAAAAAAAAAA")
+    assert not result["success"] and result["message"] == "This badge is not valid."
+
+def test_legacy_badge_of_unknown_id_falls_back_to_the_name(client, class_id):
+    result = scan(client, class_id, "999999:Walk In Player")
+    assert result["success"] and not result["is_registered"]
+    assert result["registration_message"] == "New student added"
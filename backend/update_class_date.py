@@ -3,7 +3,7 @@
 Update all classes with date 2025-07-06 to 2025-07-07
 """
 from app.database import SessionLocal
-from app.models import Class
+from app import crud
 from datetime import date
 
 def update_class_date():
@@ -11,13 +11,10 @@ def update_class_date():
     try:
         old_date = date(2025, 7, 6)
         new_date = date(2025, 7, 7)
-        classes = db.query(Class).filter(Class.date == old_date).all()
-        count = 0
-        for c in classes:
-            c.date = new_date
-            count += 1
-        db.commit()
-        print(f"Updated {count} class(es) from {old_date} to {new_date}.")
+        # One UPDATE for every class on old_date instead of loading and saving each
+        criteria = crud.class_selection(db, start_date=old_date, end_date=old_date)
+        classes = crud.shift_classes(db, criteria, (new_date - old_date).days)
+        print(f"Updated {len(classes)} class(es) from {old_date} to {new_date}.")
     except Exception as e:
         print(f"Error updating class dates: {e}")
         db.rollback()
@@ -25,4 +22,4 @@ def update_class_date():
         db.close()
 
 if __name__ == "__main__":
-    update_class_date() 
\ No newline at end of file
+    update_class_date()
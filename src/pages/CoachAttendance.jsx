@@ -20,6 +20,7 @@ import {
   Dialog,
   DialogTitle,
   DialogContent,
+  DialogActions,
   ListItemSecondaryAction,
   IconButton,
   Chip
@@ -55,6 +56,7 @@ export default function CoachAttendance() {
   // Manual attendance state
   const [showManualAttendance, setShowManualAttendance] = useState(false);
   const [uncheckedStudents, setUncheckedStudents] = useState([]);
+  const [markingAll, setMarkingAll] = useState(false);
   const [loadingUnchecked, setLoadingUnchecked] = useState(false);
 
   // New state for modifying student
@@ -117,6 +119,42 @@ export default function CoachAttendance() {
     qrScanStatusRef.current = qrScanStatus;
   }, [qrScanStatus]);
 
+  // Apply attendance changes pushed by the server, including marks from other coach devices
+  useEffect(() => {
+    if (!selectedClass) return;
+
+    const source = new EventSource(`${API_BASE_URL}/classes/${selectedClass}/live`);
+    source.addEventListener('attendance', (event) => {
+      const { records } = JSON.parse(event.data);
+      const byUser = new Map(records.map(record => [record.user_id, record]));
+      setAllStudents(students => {
+        // A newly created student is not on the roster yet; reload it
+        if (records.some(record => !students.some(student => student.id === record.user_id))) {
+          fetchAllStudentsForClass(selectedClass);
+          return students;
+        }
+        return students.map(student => {
+          const record = byUser.get(student.id);
+          return record
+            ? { ...student, status: record.status, checked_in_at: record.checked_in_at, attendance_id: record.attendance_id }
+            : student;
+        });
+      });
+    });
+    source.addEventListener('deleted', (event) => {
+      const userIds = new Set(JSON.parse(event.data).user_ids);
+      setAllStudents(students => students.map(student =>
+        userIds.has(student.id) ? { ...student, status: 'missing', checked_in_at: null, attendance_id: null } : student
+      ));
+    });
+    source.addEventListener('cleared', () => fetchAllStudentsForClass(selectedClass));
+    // The server dropped this stream for falling behind; reload and let EventSource reconnect
+    source.addEventListener('resync', () => fetchAllStudentsForClass(selectedClass));
+
+    return () => source.close();
+    // eslint-disable-next-line
+  }, [selectedClass]);
+
   const fetchPackages = async () => {
     try {
       const response = await fetch(`${API_BASE_URL}/packages`);
@@ -136,12 +174,9 @@ export default function CoachAttendance() {
 
   const fetchClassesForPackage = async () => {
     try {
-      const response = await fetch(`${API_BASE_URL}/classes`);
+      const response = await fetch(`${API_BASE_URL}/packages/${selectedPackage}/classes`);
       if (!response.ok) throw new Error('Failed to fetch classes');
-      const allClasses = await response.json();
-      
-      // Filter classes for the selected package
-      const packageClasses = allClasses.filter(cls => cls.package_id === selectedPackage);
+      const packageClasses = await response.json();
       setClasses(packageClasses);
       
       if (packageClasses.length > 0) {
@@ -516,6 +551,36 @@ export default function CoachAttendance() {
     }
   };
 
+  // Mark every unchecked student present with one mark_bulk request
+  const markAllUncheckedPresent = async () => {
+    if (uncheckedStudents.length === 0) return;
+    setMarkingAll(true);
+    try {
+      const response = await fetch(`${API_BASE_URL}/attendance/mark_bulk`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+          class_id: selectedClass,
+          entries: uncheckedStudents.map(student => ({ user_id: student.id, status: 'present' }))
+        })
+      });
+      
+      if (!response.ok) throw new Error('Failed to mark attendance');
+      const result = await response.json();
+      
+      setUncheckedStudents([]);
+      
+      // Refresh the student list
+      fetchAllStudentsForClass();
+      setSuccessMessage(`${result.results.length} students marked as present`);
+    } catch (err) {
+      setError('Failed to mark attendance');
+      console.error('Error marking attendance:', err);
+    } finally {
+      setMarkingAll(false);
+    }
+  };
+
   // Filter students based on search term
   const filteredStudents = allStudents.filter(student =>
     student.name.toLowerCase().includes(searchTerm.toLowerCase()) ||
@@ -532,10 +597,10 @@ export default function CoachAttendance() {
       if (!response.ok) throw new Error('Failed to uncheck attendance');
       
       // Remove this specific user's QR data from the scanned names set
-      // QR data format is "user_id:user_name", so we can find and remove entries that start with this user_id
+      // QR data is a signed "QA<key version>.<user_id>.<signature>" token, or "user_id:user_name" on older badges
       const userIdStr = userId.toString();
       for (const qrData of scannedNamesRef.current) {
-        if (qrData.startsWith(userIdStr + ':')) {
+        if (/^QA\d+\./.test(qrData) ? qrData.split('.')[1] === userIdStr : qrData.startsWith(userIdStr + ':')) {
           scannedNamesRef.current.delete(qrData);
           break;
         }
@@ -1103,6 +1168,19 @@ export default function CoachAttendance() {
             </List>
           )}
         </DialogContent>
+        <DialogActions>
+          <Button onClick={() => setShowManualAttendance(false)}>
+            Close
+          </Button>
+          <Button
+            variant="contained"
+            startIcon={<CheckCircleIcon />}
+            onClick={markAllUncheckedPresent}
+            disabled={loadingUnchecked || markingAll || uncheckedStudents.length === 0}
+          >
+            Mark all present
+          </Button>
+        </DialogActions>
       </Dialog>
     </Box>
   );
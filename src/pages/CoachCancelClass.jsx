@@ -69,7 +69,7 @@ export default function CoachCancelClass() {
     setLoading(true);
     try {
       const response = await fetch(
-        `${API_BASE_URL}/classes?package_id=${selectedPackage}&date=${selectedDate}`
+        `${API_BASE_URL}/packages/${selectedPackage}/classes?start_date=${selectedDate}&end_date=${selectedDate}`
       );
       if (!response.ok) throw new Error('Failed to fetch classes');
       const data = await response.json();
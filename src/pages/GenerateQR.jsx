@@ -1,6 +1,5 @@
 import { useState, useEffect } from 'react';
 import { Box, TextField, Button, Paper, Typography, Alert, CircularProgress } from '@mui/material';
-import { QRCodeSVG } from 'qrcode.react';
 import { useLocation } from 'react-router-dom';
 
 const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000/api';
@@ -76,11 +75,11 @@ export default function GenerateQR() {
           </Typography>
           
           <Box sx={{ display: 'flex', justifyContent: 'center', p: 2 }}>
-            <QRCodeSVG
-              value={userInfo.id + ":" + userInfo.name}
-              size={256}
-              level="H"
-              includeMargin={true}
+            <img
+              src={`${API_BASE_URL}/users/${userInfo.id}/qr.png`}
+              alt={`QR code for ${userInfo.name}`}
+              width={256}
+              height={256}
             />
           </Box>
           